@@ -5,41 +5,88 @@ FastAPI application for quantum circuit simulation and Bloch sphere visualizatio
 Implements the architecture specified in dev_plan.md with modular simulation pipelines.
 """
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
-from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Union, Any
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.routing import APIRoute
+from fastapi.responses import Response, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Optional, Set, Union, Any
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import asyncio
-import json
+import functools
+import itertools
+import multiprocessing
+import queue
+import secrets
+import sys
 import logging
-from datetime import datetime
+import logging.handlers
+import orjson
+import numpy as np
+import time
 import os
 from dotenv import load_dotenv
 
 from schemas import (
+    PipelineType,
     SimulationRequest,
     SimulationResponse,
     QubitState,
     WebSocketMessage,
     ErrorResponse
 )
-from utils import parse_and_validate_circuit, route_circuit
-from pipelines.base import SimulationPipeline
-from pipelines.unitary import UnitaryPipeline
-from pipelines.exact_density import ExactDensityPipeline
-from pipelines.trajectory import TrajectoryPipeline
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from utils import (
+    parse_and_validate_circuit_cached, prescan_qasm_limits, route_circuit,
+    circuit_fingerprint_cached, format_density_matrices
+)
+from pipelines import AVAILABLE_PIPELINES, PipelineResult, create_pipeline
+from worker import (
+    run_pipeline, run_trajectory_chunk, warm_all_pipelines, init_worker,
+    PROGRESS_DONE
+)
+
+# Configure logging: handlers only enqueue records, and a background listener
+# thread does the stderr I/O so request handlers never block on it
+_LOG_QUEUE: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_LOG_STREAM_HANDLER = logging.StreamHandler()
+_LOG_STREAM_HANDLER.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, _LOG_STREAM_HANDLER)
+logging.root.setLevel(logging.INFO)
+logging.root.addHandler(logging.handlers.QueueHandler(_LOG_QUEUE))
+_LOG_LISTENER.start()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="QubitLens API",
     description="Backend API for quantum circuit simulation and Bloch sphere visualization",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
+class ORJSONRequest(Request):
+    """Request whose JSON body is decoded with orjson instead of the stdlib parser"""
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so FastAPI's
+            # 422 handling for malformed bodies is unchanged
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+class ORJSONRoute(APIRoute):
+    """Route class that hands endpoints an ORJSONRequest"""
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def orjson_route_handler(request: Request) -> Response:
+            return await handler(ORJSONRequest(request.scope, request.receive))
+        
+        return orjson_route_handler
+
+app.router.route_class = ORJSONRoute
+
 # Add CORS middleware for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -49,6 +96,19 @@ app.add_middleware(
     allow_headers=["Content-Type"],
 )
 
+# Density matrix payloads are highly compressible; small responses are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
+
+# Timestamp cache: health probes hit this every second, so format at most once per second
+_CACHED_TS = {"s": -1, "iso": ""}
+
+def _iso_now() -> str:
+    """Current UTC time as an ISO-8601 string with one-second resolution"""
+    s = time.time_ns() // 1_000_000_000
+    if s != _CACHED_TS["s"]:
+        _CACHED_TS.update(s=s, iso=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(s)))
+    return _CACHED_TS["iso"]
+
 # Ensure CORS headers are present even for requests without Origin header
 @app.middleware("http")
 async def add_cors_headers(request, call_next):
@@ -65,45 +125,209 @@ async def add_cors_headers(request, call_next):
     response.headers.setdefault("Access-Control-Allow-Headers", "Content-Type")
     return response
 
-# Initialize simulation pipelines
-PIPELINES: Dict[str, SimulationPipeline] = {
-    "unitary": UnitaryPipeline(),
-    "exact_density": ExactDensityPipeline(),
-    "trajectory": TrajectoryPipeline(),
-}
+# Pipelines run in the pool workers; the server process only needs their names,
+# plus the trajectory pipeline for merging chunked runs (imported on first use)
+PIPELINE_NAMES = tuple(AVAILABLE_PIPELINES)
+
+@functools.lru_cache(maxsize=None)
+def _get_pipeline(pipeline_name: str):
+    """Pipeline instance for in-process helpers, imported and built on first use"""
+    return create_pipeline(pipeline_name)
+
+# CPU-bound simulations run in a dedicated process pool so concurrent requests
+# scale across cores instead of contending for the GIL in the default threadpool.
+SIM_WORKERS = int(os.getenv("QSV_WORKERS", os.cpu_count() or 1))
+
+# Each worker gets its own core, so keep BLAS/OpenMP single-threaded inside it
+# (override with QSV_WORKER_THREADS). Must be set before the forkserver starts.
+for _thread_var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_thread_var, os.getenv("QSV_WORKER_THREADS", "1"))
+
+def _pool_context():
+    """Forkserver on Linux: workers fork from a clean server with the pipelines preloaded"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(
+            ["worker", "pipelines.unitary", "pipelines.exact_density", "pipelines.trajectory"]
+        )
+        return ctx
+    return multiprocessing.get_context()
+
+# Created on first use: forkserver children re-import the launching __main__ module,
+# and building the pool at import time would give every worker a pool of its own
+_SIM_POOL: Optional[ProcessPoolExecutor] = None
+
+def get_sim_pool() -> ProcessPoolExecutor:
+    """Return the simulation process pool, starting it on first use"""
+    global _SIM_POOL
+    if _SIM_POOL is None:
+        _SIM_POOL = ProcessPoolExecutor(
+            max_workers=SIM_WORKERS,
+            mp_context=_pool_context(),
+            initializer=init_worker
+        )
+    return _SIM_POOL
+
+# Trajectory runs with at least two chunks' worth of shots are split across the pool
+TRAJECTORY_CHUNK_SHOTS = 512
+
+# Manager process hosting the queues that carry progress updates out of the pool
+_PROGRESS_MANAGER = None
+
+def get_progress_manager():
+    """Return the shared multiprocessing Manager, starting it on first use"""
+    global _PROGRESS_MANAGER
+    if _PROGRESS_MANAGER is None:
+        _PROGRESS_MANAGER = multiprocessing.Manager()
+    return _PROGRESS_MANAGER
+
+def _poll_progress(progress_queue, timeout: float = 0.25):
+    """Blocking read of one progress update; returns None if nothing arrived"""
+    try:
+        return progress_queue.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+# Completed simulation responses for deterministic runs, keyed by
+# (circuit_fingerprint, pipeline). Trajectory results are stochastic and never
+# cached; neither are circuits with measure/reset, which the other pipelines
+# collapse onto one sampled branch per run.
+RESULT_CACHE_SIZE = 128
+RESULT_CACHE: "OrderedDict[tuple, SimulationResponse]" = OrderedDict()
+CACHEABLE_PIPELINES = {"unitary", "exact_density"}
+
+# Interned display labels for every qubit index within the simulation limits
+_QUBIT_LABELS = tuple(sys.intern(f"Q{i}") for i in range(32))
+
+def qubit_label(qubit_id: int) -> str:
+    """Display label for a qubit, served from the precomputed table when in range"""
+    if qubit_id < len(_QUBIT_LABELS):
+        return _QUBIT_LABELS[qubit_id]
+    return f"Q{qubit_id}"
+
+def qubit_states_from_result(result: PipelineResult) -> List[QubitState]:
+    """
+    Split a pipeline's per-qubit arrays into QubitState models.
+    
+    Each array is converted to Python lists in a single call; pipeline output
+    is produced and validated by us, so Pydantic re-validation is skipped.
+    """
+    blochs = result.bloch.tolist()
+    purities = result.purity.tolist()
+    density_matrices = format_density_matrices(result.rho).tolist()
+    return [
+        QubitState.model_construct(
+            id=qubit_id,
+            bloch_coords=tuple(blochs[qubit_id]),
+            purity=purities[qubit_id],
+            density_matrix=density_matrices[qubit_id],
+            label=qubit_label(qubit_id)
+        )
+        for qubit_id in range(result.num_qubits)
+    ]
+
+def narrow_qubit_payload(qubit: dict) -> dict:
+    """
+    Cast Bloch coordinates and density matrix entries to float32 for the wire.
+    
+    Single precision is ample for rendering Bloch spheres and roughly halves
+    the serialized size of these arrays (orjson emits the shortest float32 repr).
+    """
+    qubit["bloch_coords"] = np.asarray(qubit["bloch_coords"], dtype=np.float32)
+    qubit["density_matrix"] = np.asarray(qubit["density_matrix"], dtype=np.float32)
+    return qubit
+
+def qubit_wire_payload(qubit: QubitState) -> dict:
+    """Narrowed wire dict for a QubitState, read straight from its attributes"""
+    return narrow_qubit_payload({
+        "id": qubit.id,
+        "bloch_coords": qubit.bloch_coords,
+        "purity": qubit.purity,
+        "density_matrix": qubit.density_matrix,
+        "label": qubit.label
+    })
+
+def render_simulation_response(response: SimulationResponse) -> ORJSONResponse:
+    """Serialize a SimulationResponse with float32-narrowed qubit payloads"""
+    # Only the small envelope goes through Pydantic's serializer
+    content = response.model_dump(exclude={"qubits"})
+    content["qubits"] = [qubit_wire_payload(qubit) for qubit in response.qubits]
+    return ORJSONResponse(content=content)
+
+async def send_ws_json(websocket: WebSocket, message: dict):
+    """Send a JSON text frame encoded with orjson (handles numpy arrays natively)"""
+    await websocket.send_text(orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode())
 
 # WebSocket connection manager
 class ConnectionManager:
+    # Broadcast frames buffered per client before further broadcasts are dropped
+    OUTBOX_SIZE = 32
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
         self.simulation_tasks: Dict[str, asyncio.Task] = {}
+        self.outboxes: Dict[WebSocket, asyncio.Queue] = {}
+        self.relay_tasks: Dict[WebSocket, asyncio.Task] = {}
 
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
+        outbox = asyncio.Queue(maxsize=self.OUTBOX_SIZE)
+        self.outboxes[websocket] = outbox
+        self.relay_tasks[websocket] = asyncio.create_task(self._relay(websocket, outbox))
         logger.info(f"Client {client_id} connected")
 
     def disconnect(self, websocket: WebSocket, client_id: str):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        if client_id in self.simulation_tasks:
-            self.simulation_tasks[client_id].cancel()
-            del self.simulation_tasks[client_id]
+        self._drop(websocket)
+        task = self.simulation_tasks.pop(client_id, None)
+        if task is not None:
+            task.cancel()
         logger.info(f"Client {client_id} disconnected")
 
+    def _drop(self, websocket: WebSocket):
+        """Forget a connection and stop its relay task"""
+        self.active_connections.discard(websocket)
+        self.outboxes.pop(websocket, None)
+        relay = self.relay_tasks.pop(websocket, None)
+        if relay is not None and relay is not asyncio.current_task():
+            relay.cancel()
+
+    async def _relay(self, websocket: WebSocket, outbox: asyncio.Queue):
+        """Drain one client's outbox, so a slow client only ever delays itself"""
+        try:
+            while True:
+                await websocket.send_text(await outbox.get())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Send failed: the connection is gone
+            logger.info(f"Dropping WebSocket after failed send: {e}")
+            self._drop(websocket)
+
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
+        await send_ws_json(websocket, message)
 
     async def broadcast_message(self, message: dict):
-        for connection in self.active_connections:
+        # Encode once and enqueue for every client; the relay tasks do the sending
+        text = orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        # put_nowait never yields, so the dict cannot change while we iterate it
+        dropped = 0
+        for outbox in self.outboxes.values():
             try:
-                await connection.send_json(message)
-            except:
-                # Connection might be closed, remove it
-                self.active_connections.remove(connection)
+                outbox.put_nowait(text)
+            except asyncio.QueueFull:
+                dropped += 1
+        if dropped:
+            logger.warning(f"Broadcast dropped for {dropped} client(s) whose outbox is full")
 
 manager = ConnectionManager()
 
+# WebSocket client ids: a process-wide counter is unique without touching the clock
+_CLIENT_SEQ = itertools.count()
+
+def _next_client_id() -> str:
+    return f"client_{next(_CLIENT_SEQ):x}"
+
 # Load .env if present
 load_dotenv()
 
@@ -116,14 +340,32 @@ try:
 except Exception:
     _HAS_GEMINI = False
 
+if _HAS_GEMINI and GOOGLE_API_KEY:
+    # Configure credentials once; models are reused across requests
+    genai.configure(api_key=GOOGLE_API_KEY)
+
+@functools.lru_cache(maxsize=16)
+def get_gemini_model(system_instruction: Optional[str]):
+    """GenerativeModel for a system prompt, built once per distinct prompt"""
+    return genai.GenerativeModel(GEMINI_MODEL, system_instruction=system_instruction)
+
+# Static parts of the info/health payloads, built once; only the timestamp varies
+_AVAILABLE_PIPELINES = list(PIPELINE_NAMES)
+_HEALTH_PIPELINES = {name: "available" for name in PIPELINE_NAMES}
+_HEALTH_CHAT = {
+    "provider": "google-gemini",
+    "model": GEMINI_MODEL,
+    "configured": bool(GOOGLE_API_KEY) and _HAS_GEMINI,
+}
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {
-    "message": "QubitLens API",
+        "message": "QubitLens API",
         "status": "running",
-        "timestamp": datetime.utcnow().isoformat(),
-        "available_pipelines": list(PIPELINES.keys())
+        "timestamp": _iso_now(),
+        "available_pipelines": _AVAILABLE_PIPELINES
     }
 
 @app.get("/health")
@@ -131,13 +373,9 @@ async def health_check():
     """Detailed health check"""
     return {
         "status": "healthy",
-        "pipelines": {name: "available" for name in PIPELINES.keys()},
-        "timestamp": datetime.utcnow().isoformat(),
-        "chat": {
-            "provider": "google-gemini",
-            "model": GEMINI_MODEL,
-            "configured": bool(GOOGLE_API_KEY) and _HAS_GEMINI,
-        },
+        "pipelines": _HEALTH_PIPELINES,
+        "timestamp": _iso_now(),
+        "chat": _HEALTH_CHAT,
     }
 
 
@@ -161,8 +399,7 @@ async def chat_completions(payload: ChatRequest):
         raise HTTPException(status_code=501, detail="Chat is not configured on server")
 
     try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=payload.system)
+        model = get_gemini_model(payload.system)
         # Convert messages to the expected format
         history = []
         for m in payload.messages:
@@ -174,7 +411,7 @@ async def chat_completions(payload: ChatRequest):
                 history.append({"role": "user", "parts": [content]})
 
         chat = model.start_chat(history=history)
-        result = await asyncio.get_event_loop().run_in_executor(None, chat.send_message, payload.messages[-1]["content"] if payload.messages else "Hello")
+        result = await chat.send_message_async(payload.messages[-1]["content"] if payload.messages else "Hello")
         text = getattr(result, "text", None) or (result.candidates[0].content.parts[0].text if getattr(result, "candidates", None) else "")
         if not text:
             text = "(No response)"
@@ -202,11 +439,80 @@ async def simulate_circuit(request: SimulationRequest):
     Main simulation endpoint for quantum circuits.
     Parses QASM, validates, routes to appropriate pipeline, and returns results.
     """
+    response = await execute_simulation(request)
+    return render_simulation_response(response)
+
+@app.post("/simulate/stream")
+async def simulate_circuit_stream(request: SimulationRequest):
+    """
+    Streaming variant of /simulate returning newline-delimited JSON.
+    
+    The first line carries the response envelope (pipeline, timing, circuit info)
+    and every following line is one qubit state, so clients can start rendering
+    Bloch spheres before the whole payload has been received.
+    """
+    response = await execute_simulation(request)
+    return StreamingResponse(
+        stream_simulation_response(response),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/simulate/raw", response_model=SimulationResponse)
+async def simulate_circuit_raw(
+    request: Request,
+    shots: int = Query(default=1024, ge=1, le=100000),
+    pipeline_override: Optional[PipelineType] = Query(default=None)
+):
+    """
+    Variant of /simulate taking the QASM source as a plain-text body.
+    
+    Shots and the pipeline override travel as query parameters, so the
+    circuit is sent verbatim instead of as an escaped JSON string.
+    """
+    qasm_code = (await request.body()).decode("utf-8", errors="replace")
+    try:
+        simulation_request = SimulationRequest(
+            qasm_code=qasm_code, shots=shots, pipeline_override=pipeline_override
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    response = await execute_simulation(simulation_request)
+    return render_simulation_response(response)
+
+async def stream_simulation_response(response: SimulationResponse):
+    """Yield the response envelope followed by one float32-narrowed qubit per line"""
+    header = response.model_dump(exclude={"qubits"})
+    header["num_qubits"] = len(response.qubits)
+    yield orjson.dumps(header) + b"\n"
+    for qubit in response.qubits:
+        yield orjson.dumps(
+            qubit_wire_payload(qubit),
+            option=orjson.OPT_SERIALIZE_NUMPY
+        ) + b"\n"
+
+async def execute_simulation(request: SimulationRequest) -> SimulationResponse:
+    """
+    Validate, route and run a simulation request.
+    
+    Shared by the buffered and streaming endpoints; raises HTTPException on
+    invalid input or pipeline failure.
+    """
     try:
+        if request.shots > 100000:
+            raise HTTPException(
+                status_code=400,
+                detail="Maximum 100,000 shots supported"
+            )
+        
         logger.info(f"Received simulation request with {len(request.qasm_code)} chars of QASM")
         
+        # Reject out-of-bounds payloads before paying for the QASM parser
+        limit_error = prescan_qasm_limits(request.qasm_code)
+        if limit_error:
+            raise HTTPException(status_code=400, detail=limit_error)
+        
         # Parse and validate circuit
-        circuit, validation_info = parse_and_validate_circuit(request.qasm_code)
+        circuit, validation_info = parse_and_validate_circuit_cached(request.qasm_code)
         
         if not validation_info["is_valid"]:
             raise HTTPException(
@@ -223,15 +529,12 @@ async def simulate_circuit(request: SimulationRequest):
         
         logger.info(f"Routed to {pipeline_name} pipeline for circuit with {circuit.num_qubits} qubits, unitary={validation_info['is_unitary']}")
         
-        if pipeline_name not in PIPELINES:
+        if pipeline_name not in PIPELINE_NAMES:
             raise HTTPException(
                 status_code=500,
                 detail=f"Pipeline {pipeline_name} not available"
             )
         
-        # Run simulation
-        pipeline = PIPELINES[pipeline_name]
-        
         # Apply security limits
         if circuit.num_qubits > 24:
             raise HTTPException(
@@ -245,18 +548,39 @@ async def simulate_circuit(request: SimulationRequest):
                 detail="Maximum 1000 operations supported"
             )
         
-        if request.shots > 100000:
-            raise HTTPException(
-                status_code=400,
-                detail="Maximum 100,000 shots supported"
-            )
+        circuit_info = {
+            "num_qubits": circuit.num_qubits,
+            "num_operations": len(circuit.data),
+            "is_unitary": validation_info["is_unitary"],
+            "supported_gates": validation_info["supported_gates"]
+        }
+        
+        # Serve semantically identical deterministic requests from the result cache.
+        # Shots do not affect these pipelines, so they are not part of the key.
+        cacheable = pipeline_name in CACHEABLE_PIPELINES and validation_info["is_unitary"]
+        if cacheable:
+            cache_key = (circuit_fingerprint_cached(request.qasm_code, circuit), pipeline_name)
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                RESULT_CACHE.move_to_end(cache_key)
+                logger.info(f"Result cache hit for {pipeline_name} pipeline")
+                return cached.model_copy(update={
+                    "shots_used": request.shots,
+                    "circuit_info": circuit_info,
+                    "metadata": {**cached.metadata, "cache_hit": True},
+                })
         
         # Run simulation with timeout
+        loop = asyncio.get_running_loop()
         try:
             async with asyncio.timeout(300):  # 5 minute timeout
-                results = await asyncio.get_event_loop().run_in_executor(
-                    None, pipeline.run, circuit, request.shots
-                )
+                if pipeline_name == "trajectory" and SIM_WORKERS > 1 \
+                        and request.shots >= 2 * TRAJECTORY_CHUNK_SHOTS:
+                    results = await run_trajectory_chunked(request.qasm_code, request.shots)
+                else:
+                    results = await loop.run_in_executor(
+                        get_sim_pool(), run_pipeline, pipeline_name, request.qasm_code, request.shots
+                    )
         except asyncio.TimeoutError:
             raise HTTPException(
                 status_code=408,
@@ -267,11 +591,12 @@ async def simulate_circuit(request: SimulationRequest):
             if pipeline_name != 'exact_density' and 'not suitable' in str(pipeline_error).lower():
                 logger.warning(f"{pipeline_name} pipeline failed: {pipeline_error}. Falling back to exact_density pipeline.")
                 try:
-                    fallback_pipeline = PIPELINES['exact_density']
-                    results = await asyncio.get_event_loop().run_in_executor(
-                        None, fallback_pipeline.run, circuit, request.shots
+                    results = await loop.run_in_executor(
+                        get_sim_pool(), run_pipeline, 'exact_density', request.qasm_code, request.shots
                     )
                     pipeline_name = 'exact_density'  # Update for response
+                    # cache_key names the pipeline that failed; keep the fallback result out
+                    cacheable = False
                 except Exception as fallback_error:
                     logger.error(f"Fallback pipeline also failed: {fallback_error}")
                     raise HTTPException(
@@ -284,37 +609,22 @@ async def simulate_circuit(request: SimulationRequest):
                     detail=f"Pipeline {pipeline_name} simulation failed: {str(pipeline_error)}"
                 )
         
-        # Format results
-        qubit_states = []
-        execution_time = results.get("execution_time", 0.0)
+        qubit_states = qubit_states_from_result(results)
         
-        for qubit_id, data in results.items():
-            # Skip metadata entries
-            if not isinstance(qubit_id, int) or not isinstance(data, dict):
-                continue
-                
-            qubit_state = QubitState(
-                id=qubit_id,
-                bloch_coords=data["bloch"],
-                purity=data["purity"],
-                density_matrix=data["rho"],
-                label=f"Q{qubit_id}"
-            )
-            qubit_states.append(qubit_state)
-        
-        response = SimulationResponse(
+        response = SimulationResponse.model_construct(
             qubits=qubit_states,
             pipeline_used=pipeline_name,
-            execution_time=execution_time,
+            execution_time=results.execution_time,
             shots_used=request.shots,
-            circuit_info={
-                "num_qubits": circuit.num_qubits,
-                "num_operations": len(circuit.data),
-                "is_unitary": validation_info["is_unitary"],
-                "supported_gates": validation_info["supported_gates"]
-            }
+            circuit_info=circuit_info,
+            metadata={}
         )
         
+        if cacheable:
+            RESULT_CACHE[cache_key] = response
+            if len(RESULT_CACHE) > RESULT_CACHE_SIZE:
+                RESULT_CACHE.popitem(last=False)
+        
         logger.info(f"Simulation completed successfully with {len(qubit_states)} qubits")
         return response
         
@@ -327,65 +637,108 @@ async def simulate_circuit(request: SimulationRequest):
             detail=f"Internal simulation error: {str(e)}"
         )
 
+async def run_trajectory_chunked(qasm_code: str, shots: int) -> PipelineResult:
+    """
+    Split a trajectory simulation into independent shot chunks run in parallel.
+    Trajectories are embarrassingly parallel, so this scales with the pool size.
+    """
+    n_chunks = min(SIM_WORKERS, shots // TRAJECTORY_CHUNK_SHOTS)
+    chunks = [shots // n_chunks] * n_chunks
+    for i in range(shots % n_chunks):
+        chunks[i] += 1
+    
+    seed = secrets.randbits(31)
+    loop = asyncio.get_running_loop()
+    partials = await asyncio.gather(*(
+        loop.run_in_executor(get_sim_pool(), run_trajectory_chunk, qasm_code, chunk, seed + i)
+        for i, chunk in enumerate(chunks)
+    ))
+    return _get_pipeline("trajectory").merge_results(partials, chunks)
+
+async def receive_ws_json(websocket: WebSocket) -> Any:
+    """
+    Receive one WebSocket message and decode it with orjson.
+    
+    Accepts both text and binary frames, so browser clients sending JSON as
+    text keep working.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message["code"], message.get("reason"))
+    text = message.get("text")
+    return orjson.loads(text if text is not None else message["bytes"])
+
+async def _ws_start_simulation(websocket: WebSocket, client_id: str, message: dict):
+    # Start streaming simulation
+    await handle_streaming_simulation(
+        websocket=websocket,
+        client_id=client_id,
+        request_data=message["data"]
+    )
+
+async def _ws_pause_simulation(websocket: WebSocket, client_id: str, message: dict):
+    # Pause current simulation
+    task = manager.simulation_tasks.get(client_id)
+    if task is not None:
+        task.cancel()
+        await send_ws_json(websocket, {
+            "type": "simulation_paused",
+            "message": "Simulation paused by user"
+        })
+
+async def _ws_resume_simulation(websocket: WebSocket, client_id: str, message: dict):
+    # Resume simulation (placeholder for stretch goal)
+    await send_ws_json(websocket, {
+        "type": "simulation_resumed",
+        "message": "Resume functionality not yet implemented"
+    })
+
+async def _ws_step_forward(websocket: WebSocket, client_id: str, message: dict):
+    # Step-by-step execution (placeholder for stretch goal)
+    await send_ws_json(websocket, {
+        "type": "step_completed",
+        "message": "Step-by-step execution not yet implemented"
+    })
+
+async def _ws_unknown_message(websocket: WebSocket, client_id: str, message: dict):
+    await send_ws_json(websocket, {
+        "type": "error",
+        "message": f"Unknown message type: {message.get('type', 'none')}"
+    })
+
+# Client message type -> handler(websocket, client_id, message)
+WS_HANDLERS = {
+    "start_simulation": _ws_start_simulation,
+    "pause_simulation": _ws_pause_simulation,
+    "resume_simulation": _ws_resume_simulation,
+    "step_forward": _ws_step_forward
+}
+
 @app.websocket("/ws/simulate")
 async def websocket_simulate(websocket: WebSocket):
     """
     WebSocket endpoint for real-time simulation streaming.
     Supports step-by-step execution and progress updates.
     """
-    client_id = f"client_{datetime.utcnow().timestamp()}"
+    client_id = _next_client_id()
     await manager.connect(websocket, client_id)
     
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            logger.info(f"WebSocket received: {message.get('type', 'unknown')}")
-            
-            if message["type"] == "start_simulation":
-                # Start streaming simulation
-                await handle_streaming_simulation(
-                    websocket=websocket,
-                    client_id=client_id,
-                    request_data=message["data"]
-                )
-            
-            elif message["type"] == "pause_simulation":
-                # Pause current simulation
-                if client_id in manager.simulation_tasks:
-                    manager.simulation_tasks[client_id].cancel()
-                    await websocket.send_json({
-                        "type": "simulation_paused",
-                        "message": "Simulation paused by user"
-                    })
+            message = await receive_ws_json(websocket)
+            message_type = message.get("type")
             
-            elif message["type"] == "resume_simulation":
-                # Resume simulation (placeholder for stretch goal)
-                await websocket.send_json({
-                    "type": "simulation_resumed",
-                    "message": "Resume functionality not yet implemented"
-                })
-            
-            elif message["type"] == "step_forward":
-                # Step-by-step execution (placeholder for stretch goal)
-                await websocket.send_json({
-                    "type": "step_completed",
-                    "message": "Step-by-step execution not yet implemented"
-                })
+            logger.info(f"WebSocket received: {message_type or 'unknown'}")
             
-            else:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": f"Unknown message type: {message.get('type', 'none')}"
-                })
+            handler = WS_HANDLERS.get(message_type, _ws_unknown_message)
+            await handler(websocket, client_id, message)
                 
     except WebSocketDisconnect:
         manager.disconnect(websocket, client_id)
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
-        await websocket.send_json({
+        await send_ws_json(websocket, {
             "type": "error",
             "message": f"Server error: {str(e)}"
         })
@@ -398,20 +751,28 @@ async def handle_streaming_simulation(websocket: WebSocket, client_id: str, requ
         qasm_code = request_data.get("qasm_code", "")
         shots = request_data.get("shots", 1024)
         
-        circuit, validation_info = parse_and_validate_circuit(qasm_code)
+        # Same pre-parse guard as the REST endpoint
+        limit_error = prescan_qasm_limits(qasm_code)
+        if limit_error:
+            await send_ws_json(websocket, {
+                "type": "error",
+                "message": limit_error
+            })
+            return
+        
+        circuit, validation_info = parse_and_validate_circuit_cached(qasm_code)
         
         if not validation_info["is_valid"]:
-            await websocket.send_json({
+            await send_ws_json(websocket, {
                 "type": "error",
                 "message": f"Invalid circuit: {validation_info['errors']}"
             })
             return
         
         pipeline_name = route_circuit(circuit, shots)
-        pipeline = PIPELINES[pipeline_name]
         
         # Send start confirmation
-        await websocket.send_json({
+        await send_ws_json(websocket, {
             "type": "simulation_started",
             "pipeline": pipeline_name,
             "circuit_info": {
@@ -422,7 +783,7 @@ async def handle_streaming_simulation(websocket: WebSocket, client_id: str, requ
         
         # Create and store simulation task
         task = asyncio.create_task(
-            run_streaming_simulation(websocket, pipeline, circuit, shots)
+            run_streaming_simulation(websocket, pipeline_name, qasm_code, shots)
         )
         manager.simulation_tasks[client_id] = task
         
@@ -430,80 +791,109 @@ async def handle_streaming_simulation(websocket: WebSocket, client_id: str, requ
         await task
         
     except asyncio.CancelledError:
-        await websocket.send_json({
+        await send_ws_json(websocket, {
             "type": "simulation_cancelled",
             "message": "Simulation was cancelled"
         })
     except Exception as e:
-        await websocket.send_json({
+        await send_ws_json(websocket, {
             "type": "error", 
             "message": f"Streaming simulation error: {str(e)}"
         })
 
-async def run_streaming_simulation(websocket: WebSocket, pipeline: SimulationPipeline, circuit, shots: int):
+async def run_streaming_simulation(websocket: WebSocket, pipeline_name: str, qasm_code: str, shots: int):
     """Run simulation with progress streaming"""
     try:
-        # Send progress updates
-        for progress in range(0, 101, 20):
-            await websocket.send_json({
-                "type": "progress",
-                "progress": progress,
-                "message": f"Simulation {progress}% complete"
-            })
-            await asyncio.sleep(0.5)  # Simulate work
+        loop = asyncio.get_running_loop()
+        progress_queue = get_progress_manager().Queue()
         
-        # Run actual simulation
-        results = await asyncio.get_event_loop().run_in_executor(
-            None, pipeline.run, circuit, shots
+        # Run actual simulation; the pipeline reports progress through the queue
+        future = loop.run_in_executor(
+            get_sim_pool(), run_pipeline, pipeline_name, qasm_code, shots, progress_queue
         )
         
-        # Send final results
-        qubit_states = []
-        for qubit_id, data in results.items():
-            qubit_state = {
-                "id": qubit_id,
-                "bloch_coords": data["bloch"],
-                "purity": data["purity"],
-                "density_matrix": data["rho"],
-                "label": f"Q{qubit_id}"
-            }
-            qubit_states.append(qubit_state)
+        # Forward every progress update in order until the worker signals completion.
+        # The future check only matters if the worker died without sending the sentinel.
+        while True:
+            update = await loop.run_in_executor(None, _poll_progress, progress_queue)
+            if update == PROGRESS_DONE or (update is None and future.done()):
+                break
+            if update is not None:
+                progress, message = update
+                await send_ws_json(websocket, {
+                    "type": "progress",
+                    "progress": progress,
+                    "message": message
+                })
         
-        await websocket.send_json({
+        results = await future
+        
+        # Send final results
+        await send_ws_json(websocket, {
             "type": "simulation_complete",
-            "qubits": qubit_states,
-            "execution_time": results.get("execution_time", 0.0)
+            "qubits": [qubit_wire_payload(qubit) for qubit in qubit_states_from_result(results)],
+            "execution_time": results.execution_time
         })
         
     except asyncio.CancelledError:
         raise
     except Exception as e:
-        await websocket.send_json({
+        await send_ws_json(websocket, {
             "type": "error",
             "message": f"Simulation error: {str(e)}"
         })
 
+@app.on_event("startup")
+async def warm_simulation_pool():
+    """
+    Start the pool workers and warm every pipeline in them before serving,
+    so the first requests do not pay for lazy qiskit/Aer initialisation.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # One job per worker; concurrent submission spreads them across the processes
+    warmed = await asyncio.gather(
+        *(loop.run_in_executor(get_sim_pool(), warm_all_pipelines) for _ in range(SIM_WORKERS)),
+        return_exceptions=True
+    )
+    failures = [w for w in warmed if isinstance(w, Exception)]
+    if failures:
+        logger.warning(f"Pipeline warmup failed in {len(failures)} worker(s): {failures[0]}")
+    logger.info(f"Warmed simulation pool ({SIM_WORKERS} workers) in {time.perf_counter() - start:.2f}s")
+
+@app.on_event("shutdown")
+async def shutdown_simulation_pool():
+    """Stop simulation worker processes with the server"""
+    if _SIM_POOL is not None:
+        _SIM_POOL.shutdown(wait=True, cancel_futures=True)
+    if _PROGRESS_MANAGER is not None:
+        _PROGRESS_MANAGER.shutdown()
+    _LOG_LISTENER.stop()
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Custom HTTP exception handler"""
-    from fastapi.responses import JSONResponse
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": {
                 "status_code": exc.status_code,
                 "detail": exc.detail,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": _iso_now()
             }
         }
     )
 
 if __name__ == "__main__":
     import uvicorn
+    # Production settings; use start.py for an auto-reloading dev server
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        loop="uvloop",
+        http="httptools",
+        ws_per_message_deflate=True,
+        workers=int(os.getenv("QSV_UVICORN_WORKERS", "1")),
         log_level="info"
     )
@@ -10,13 +10,15 @@ This package implements the modular simulation architecture specified in dev_pla
 All pipelines follow the same interface and return standardized results.
 """
 
-from .base import SimulationPipeline, SimulationError, UnsupportedCircuitError, ResourceLimitError
-from .unitary import UnitaryPipeline
-from .exact_density import ExactDensityPipeline
-from .trajectory import TrajectoryPipeline
+import importlib
+
+from .base import SimulationPipeline, PipelineResult, MAX_QUBITS, STATE_DTYPE, SimulationError, UnsupportedCircuitError, ResourceLimitError
 
 __all__ = [
     'SimulationPipeline',
+    'PipelineResult',
+    'STATE_DTYPE',
+    'MAX_QUBITS',
     'SimulationError', 
     'UnsupportedCircuitError',
     'ResourceLimitError',
@@ -25,13 +27,40 @@ __all__ = [
     'TrajectoryPipeline'
 ]
 
-# Pipeline registry for dynamic loading
+# Pipeline registry for dynamic loading. Classes are referenced by dotted path
+# and imported on first use, so importing the package (e.g. for the exception
+# types) does not pull in Qiskit Aer.
 AVAILABLE_PIPELINES = {
-    'unitary': UnitaryPipeline,
-    'exact_density': ExactDensityPipeline,
-    'trajectory': TrajectoryPipeline
+    'unitary': '.unitary.UnitaryPipeline',
+    'exact_density': '.exact_density.ExactDensityPipeline',
+    'trajectory': '.trajectory.TrajectoryPipeline'
+}
+
+_PIPELINE_CLASSES = {
+    path.rsplit('.', 1)[1]: path for path in AVAILABLE_PIPELINES.values()
 }
 
+def _import_class(path: str) -> type:
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name, __name__), class_name)
+
+def get_pipeline_class(pipeline_name: str) -> type:
+    """
+    Import and return the class registered under a pipeline name.
+    
+    Raises:
+        ValueError: If pipeline name is not recognized
+    """
+    if pipeline_name not in AVAILABLE_PIPELINES:
+        raise ValueError(f"Unknown pipeline: {pipeline_name}. Available: {list(AVAILABLE_PIPELINES.keys())}")
+    return _import_class(AVAILABLE_PIPELINES[pipeline_name])
+
+def __getattr__(name: str):
+    # Lazy access to the pipeline classes listed in __all__
+    if name in _PIPELINE_CLASSES:
+        return _import_class(_PIPELINE_CLASSES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def create_pipeline(pipeline_name: str) -> SimulationPipeline:
     """
     Factory function to create pipeline instances.
@@ -45,36 +74,34 @@ def create_pipeline(pipeline_name: str) -> SimulationPipeline:
     Raises:
         ValueError: If pipeline name is not recognized
     """
-    if pipeline_name not in AVAILABLE_PIPELINES:
-        raise ValueError(f"Unknown pipeline: {pipeline_name}. Available: {list(AVAILABLE_PIPELINES.keys())}")
-    
-    pipeline_class = AVAILABLE_PIPELINES[pipeline_name]
-    return pipeline_class()
+    return get_pipeline_class(pipeline_name)()
 
 def list_available_pipelines() -> list:
     """Return list of available pipeline names"""
     return list(AVAILABLE_PIPELINES.keys())
 
+# Pipeline capabilities only depend on class attributes, so they are built once
+_PIPELINE_INFO = None
+
 def get_pipeline_info() -> dict:
     """
     Get information about all available pipelines.
     
+    Reads class-level attributes, so no pipeline is instantiated.
+    
     Returns:
         Dictionary with pipeline capabilities and limits
     """
-    info = {}
-    
-    for name, pipeline_class in AVAILABLE_PIPELINES.items():
-        try:
-            pipeline = pipeline_class()
-            info[name] = {
-                'name': pipeline.name,
-                'max_qubits': getattr(pipeline, 'max_qubits', None),
-                'supports_measurements': getattr(pipeline, 'supports_measurements', lambda: False)(),
-                'supports_noise': getattr(pipeline, 'supports_noise', lambda: False)(),
-                'description': pipeline.__class__.__doc__.split('\n')[1].strip() if pipeline.__class__.__doc__ else ""
+    global _PIPELINE_INFO
+    if _PIPELINE_INFO is None:
+        _PIPELINE_INFO = {}
+        for name in AVAILABLE_PIPELINES:
+            pipeline_class = get_pipeline_class(name)
+            _PIPELINE_INFO[name] = {
+                'name': pipeline_class.__name__,
+                'max_qubits': getattr(pipeline_class, 'max_qubits', None),
+                'supports_measurements': pipeline_class.supports_measurements(),
+                'supports_noise': pipeline_class.supports_noise(),
+                'description': (pipeline_class.__doc__ or "").strip().split('\n')[0].strip()
             }
-        except Exception as e:
-            info[name] = {'error': str(e)}
-    
-    return info
+    return _PIPELINE_INFO
@@ -0,0 +1,171 @@
+"""
+Optional Numba kernels for the simulation pipelines.
+
+Numba is not a hard dependency: callers check _HAS_NUMBA and keep their
+NumPy path when it is not installed.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange  # type: ignore
+    _HAS_NUMBA = True
+except Exception:
+    _HAS_NUMBA = False
+
+if _HAS_NUMBA:
+    @njit(cache=True, parallel=True, fastmath=True)
+    def reduced_rho(dm, n_qubits, target_qubit, out):
+        """
+        Reduced 2x2 density matrix of target_qubit from a full (2^n, 2^n)
+        density matrix, written into out.
+
+        Only the 4 * 2^(n-1) entries whose non-target bits agree are read:
+        each basis index of the other qubits is widened by inserting the
+        target bit (qubit 0 is the least significant bit).
+        """
+        bit = 1 << target_qubit
+        low_mask = bit - 1
+        r00 = 0j
+        r01 = 0j
+        r10 = 0j
+        r11 = 0j
+        for rest in prange(1 << (n_qubits - 1)):
+            zero = ((rest & ~low_mask) << 1) | (rest & low_mask)
+            one = zero | bit
+            r00 += dm[zero, zero]
+            r01 += dm[zero, one]
+            r10 += dm[one, zero]
+            r11 += dm[one, one]
+        out[0, 0] = r00
+        out[0, 1] = r01
+        out[1, 0] = r10
+        out[1, 1] = r11
+
+    @njit(cache=True, parallel=True, fastmath=True)
+    def single_qubit_rdms(psi, n_qubits, out):
+        """
+        Unnormalized reduced density matrices of every qubit from a flat
+        statevector, written into out of shape (n_qubits, 2, 2).
+
+        A flattened (shots, 2^n) stack also works: the shot index sits in the
+        high bits and is summed along with the traced qubits.
+        """
+        half = psi.shape[0] >> 1
+        for qubit in prange(n_qubits):
+            bit = 1 << qubit
+            low_mask = bit - 1
+            r00 = 0.0
+            r11 = 0.0
+            r01 = 0j
+            for rest in range(half):
+                zero = ((rest & ~low_mask) << 1) | (rest & low_mask)
+                a0 = psi[zero]
+                a1 = psi[zero | bit]
+                r00 += a0.real * a0.real + a0.imag * a0.imag
+                r11 += a1.real * a1.real + a1.imag * a1.imag
+                r01 += a0 * a1.conjugate()
+            out[qubit, 0, 0] = r00
+            out[qubit, 0, 1] = r01
+            out[qubit, 1, 0] = r01.conjugate()
+            out[qubit, 1, 1] = r11
+
+    @njit(cache=True, fastmath=True)
+    def measure_collapse(psi, target_qubit, rnd):
+        """
+        Projective measurement of target_qubit with uniform sample rnd,
+        collapsing psi in place. Returns the outcome; psi is left unchanged
+        when the sampled outcome has zero probability.
+        """
+        bit = 1 << target_qubit
+        p0 = 0.0
+        p1 = 0.0
+        for idx in range(psi.shape[0]):
+            a = psi[idx]
+            if idx & bit:
+                p1 += a.real * a.real + a.imag * a.imag
+            else:
+                p0 += a.real * a.real + a.imag * a.imag
+        outcome = 0 if rnd < p0 else 1
+        norm = np.sqrt(p1 if outcome else p0)
+        if norm == 0.0:
+            return outcome
+        keep = bit if outcome else 0
+        scale = 1.0 / norm
+        for idx in range(psi.shape[0]):
+            if (idx & bit) == keep:
+                psi[idx] *= scale
+            else:
+                psi[idx] = 0
+        return outcome
+
+    @njit(cache=True, fastmath=True)
+    def reset_qubit(psi, target_qubit, rnd):
+        """
+        Reset target_qubit to |0> in place along one trajectory: sample its
+        value with uniform rnd as a measurement would, then move that
+        branch's amplitudes onto target_qubit = 0.
+        """
+        bit = 1 << target_qubit
+        p0 = 0.0
+        p1 = 0.0
+        for idx in range(psi.shape[0]):
+            a = psi[idx]
+            if idx & bit:
+                p1 += a.real * a.real + a.imag * a.imag
+            else:
+                p0 += a.real * a.real + a.imag * a.imag
+        outcome = 0 if rnd < p0 else 1
+        norm = np.sqrt(p1 if outcome else p0)
+        if norm == 0.0:
+            return
+        source = bit if outcome else 0
+        scale = 1.0 / norm
+        low_mask = bit - 1
+        for rest in range(psi.shape[0] >> 1):
+            zero = ((rest & ~low_mask) << 1) | (rest & low_mask)
+            psi[zero] = psi[zero | source] * scale
+            psi[zero | bit] = 0
+
+    @njit(cache=True, fastmath=True)
+    def apply_matrix(psi, gate_matrix, qargs):
+        """
+        Apply a 2^k x 2^k gate_matrix on qargs to psi, returning a new array.
+
+        Bit j of the gate's row/column index is qubit qargs[j], as in Qiskit.
+        """
+        k = qargs.shape[0]
+        block_dim = 1 << k
+        sorted_qargs = np.sort(qargs)
+        new_psi = np.empty_like(psi)
+        indices = np.empty(block_dim, dtype=np.int64)
+        block = np.empty(block_dim, dtype=psi.dtype)
+        for base in range(psi.shape[0] >> k):
+            # Spread base over the non-gate qubits by inserting zero bits
+            template = base
+            for q in sorted_qargs:
+                template = ((template >> q) << (q + 1)) | (template & ((1 << q) - 1))
+            for sub in range(block_dim):
+                idx = template
+                for j in range(k):
+                    if (sub >> j) & 1:
+                        idx |= 1 << qargs[j]
+                indices[sub] = idx
+                block[sub] = psi[idx]
+            for row in range(block_dim):
+                acc = 0j
+                for col in range(block_dim):
+                    acc += gate_matrix[row, col] * block[col]
+                new_psi[indices[row]] = acc
+        return new_psi
+
+    # Compile for the dtypes the pipelines pass now; the forkserver preloads
+    # this module, so pool workers start with the kernels ready
+    reduced_rho(np.eye(4, dtype=np.complex64) / 4, 2, 0, np.empty((2, 2), dtype=np.complex64))
+    for _dtype in (np.complex64, np.complex128):
+        single_qubit_rdms(np.full(4, 0.5, dtype=_dtype), 2, np.empty((2, 2, 2), dtype=np.complex128))
+    for _dtype in (np.complex64, np.complex128):
+        _basis = np.array([1.0, 0.0], dtype=_dtype)
+        measure_collapse(_basis, 0, 0.5)
+        reset_qubit(_basis, 0, 0.5)
+        apply_matrix(_basis, np.eye(2, dtype=_dtype), np.zeros(1, dtype=np.int64))
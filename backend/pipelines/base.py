@@ -4,13 +4,66 @@ Defines abstract base class for all quantum simulation pipelines as specified in
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Callable, Tuple
 import time
 import logging
+
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Progress callback signature: (percent_complete, message) -> None
+ProgressCallback = Callable[[int, str], None]
+
+# Global qubit limit; every pipeline's max_qubits is within it
+MAX_QUBITS = 24
+
+# Precision of state buffers and reduced density matrices. Single precision is
+# ample for rendering and halves the memory traffic of the partial traces.
+STATE_DTYPE = np.complex64
+# Density matrix dtypes accepted by postprocess_results
+RESULT_DTYPES = (np.complex64, np.complex128)
+
+# Operations that make the state mixed; circuits without them are pure throughout.
+# Qiskit operation names are lowercase, so they can be tested as-is.
+NON_UNITARY_OPS = frozenset(('measure', 'reset', 'noise', 'kraus'))
+
+# Scratch arrays reused across runs in this process, keyed by (shape, dtype)
+_SCRATCH_BUFFERS: Dict[Tuple[Tuple[int, ...], np.dtype], np.ndarray] = {}
+
+def scratch_buffer(shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """
+    Uninitialised array of the given shape and dtype, reused across runs.
+    
+    Saves re-allocating (and page-faulting in) large state buffers on every
+    run. Pipelines run one at a time per worker process, so a buffer is free
+    again once run() returns; results must never alias it.
+    """
+    key = (tuple(shape), np.dtype(dtype))
+    buffer = _SCRATCH_BUFFERS.get(key)
+    if buffer is None:
+        buffer = _SCRATCH_BUFFERS[key] = np.empty(key[0], dtype=key[1])
+    return buffer
+
+@dataclass
+class PipelineResult:
+    """
+    Simulation result for n qubits, stored as arrays indexed by qubit id.
+    
+    Kept in NumPy form from the pipeline to the API layer, which converts it
+    to per-qubit payloads only when building the response.
+    """
+    bloch: np.ndarray         # (n, 3) float64 Bloch coordinates
+    purity: np.ndarray        # (n,) float64 purities in [0, 1]
+    rho: np.ndarray           # (n, 2, 2) complex64/complex128 reduced density matrices
+    execution_time: float
+    meta: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def num_qubits(self) -> int:
+        return len(self.purity)
+
 class SimulationPipeline(ABC):
     """
     Abstract base class for quantum simulation pipelines.
@@ -23,51 +76,49 @@ class SimulationPipeline(ABC):
         self.name = name or self.__class__.__name__
         self.logger = logging.getLogger(f"pipeline.{self.name}")
     
+    @classmethod
+    def supports_measurements(cls) -> bool:
+        """Whether the pipeline can simulate mid-circuit measurements"""
+        return False
+    
+    @classmethod
+    def supports_noise(cls) -> bool:
+        """Whether the pipeline can simulate noise channels"""
+        return False
+    
     @abstractmethod
-    def run(self, circuit, shots: int = 1024) -> Dict[int, Dict[str, Any]]:
+    def run(self, circuit, shots: int = 1024,
+            progress_cb: Optional[ProgressCallback] = None) -> PipelineResult:
         """
         Run quantum simulation on the given circuit.
         
         Args:
             circuit: Qiskit QuantumCircuit object to simulate
             shots: Number of shots for statistical simulation (ignored for exact methods)
+            progress_cb: Optional callback invoked as progress_cb(percent, message)
+                at natural checkpoints of the simulation
             
         Returns:
-            Dictionary mapping qubit_id -> {
-                'bloch': [x, y, z],  # Bloch sphere coordinates
-                'purity': float,     # State purity (0-1)
-                'rho': [[complex, complex], [complex, complex]]  # 2x2 density matrix
-            }
-            
-        The return format also includes:
-            'execution_time': float  # Time taken for simulation
+            PipelineResult with per-qubit Bloch coordinates, purities and
+            2x2 reduced density matrices (see postprocess_results)
         """
         pass
     
-    def validate_circuit(self, circuit) -> bool:
+    @staticmethod
+    def validate_circuit(circuit) -> bool:
         """
         Validate circuit is suitable for this pipeline.
         Can be overridden by specific pipelines.
         
+        Empty circuits (identity) are allowed; pipelines handle |0...0>.
+        
         Args:
             circuit: QuantumCircuit to validate
             
         Returns:
             True if circuit can be simulated by this pipeline
         """
-        try:
-            # Basic validation
-            if circuit.num_qubits <= 0:
-                return False
-            if circuit.num_qubits > 24:  # Global limit
-                return False
-            # Allow empty circuits (identity); pipelines should handle |0...0>
-            # if len(circuit.data) == 0:
-            #     return False
-            return True
-        except Exception as e:
-            self.logger.error(f"Circuit validation failed: {e}")
-            return False
+        return 0 < circuit.num_qubits <= MAX_QUBITS
     
     def preprocess_circuit(self, circuit):
         """
@@ -83,51 +134,42 @@ class SimulationPipeline(ABC):
         # Default: return circuit as-is
         return circuit
     
-    def postprocess_results(self, raw_results: Dict[int, Dict[str, Any]], 
-                          execution_time: float) -> Dict[int, Dict[str, Any]]:
+    def postprocess_results(self, bloch: np.ndarray, purity: np.ndarray, rho: np.ndarray,
+                          execution_time: float) -> PipelineResult:
         """
         Post-process simulation results for consistency.
         
         Args:
-            raw_results: Raw results from simulation
+            bloch: (n, 3) Bloch coordinates, one row per qubit
+            purity: (n,) purities
+            rho: (n, 2, 2) reduced density matrices, complex64 or complex128
             execution_time: Time taken for simulation
             
         Returns:
-            Processed results with execution_time added
+            PipelineResult wrapping the validated arrays
         """
-        # Add execution time to results
-        processed_results = raw_results.copy()
-        processed_results['execution_time'] = execution_time
+        if rho.dtype not in RESULT_DTYPES:
+            raise SimulationError(f"Unexpected density matrix dtype {rho.dtype}", pipeline=self.name)
+        
+        # Validate purity is in [0, 1]
+        np.clip(purity, 0.0, 1.0, out=purity)
         
-        # Validate all qubit results
-        for qubit_id, data in processed_results.items():
-            if qubit_id == 'execution_time':
-                continue
-                
-            # Ensure required fields exist
-            required_fields = ['bloch', 'purity', 'rho']
-            for field in required_fields:
-                if field not in data:
-                    self.logger.warning(f"Missing {field} for qubit {qubit_id}")
-                    
-            # Validate purity is in [0, 1]
-            if 'purity' in data:
-                data['purity'] = np.clip(data['purity'], 0.0, 1.0)
-                
-            # Validate Bloch vector magnitude
-            if 'bloch' in data:
-                x, y, z = data['bloch']
-                magnitude = float(np.sqrt(x*x + y*y + z*z))
-                # If numerically just above 1, clamp; if much larger, normalize and warn
-                if magnitude > 1.0:
-                    if magnitude <= 1.000001:
-                        scale = 1.0 / magnitude
-                        data['bloch'] = [x*scale, y*scale, z*scale]
-                    else:
-                        self.logger.warning(f"Bloch vector magnitude {magnitude} > 1 for qubit {qubit_id}")
-                        data['bloch'] = [x/magnitude, y/magnitude, z/magnitude]
+        # Validate Bloch vector magnitudes; rows just above 1 are clamped silently,
+        # much larger ones are normalized with a warning
+        magnitude = np.linalg.norm(bloch, axis=1)
+        too_long = magnitude > 1.0
+        if too_long.any():
+            for qubit_id in np.flatnonzero(magnitude > 1.000001):
+                self.logger.warning(f"Bloch vector magnitude {magnitude[qubit_id]} > 1 for qubit {qubit_id}")
+            bloch[too_long] /= magnitude[too_long, None]
         
-        return processed_results
+        return PipelineResult(
+            bloch=bloch,
+            purity=purity,
+            rho=rho,
+            execution_time=execution_time,
+            meta={'pipeline': self.name}
+        )
     
     def estimate_resources(self, circuit) -> Dict[str, Any]:
         """
@@ -167,6 +209,16 @@ class SimulationPipeline(ABC):
         else:
             return "high"
     
+    def report_progress(self, progress_cb: Optional[ProgressCallback], progress: int, message: str):
+        """Forward a progress update to the callback, if one was supplied"""
+        if progress_cb is None:
+            return
+        try:
+            progress_cb(progress, message)
+        except Exception as e:
+            # Progress reporting must never break a simulation
+            self.logger.debug(f"Progress callback failed: {e}")
+    
     def log_simulation_start(self, circuit, shots: int):
         """Log simulation start with circuit info"""
         self.logger.info(f"Starting {self.name} simulation: {circuit.num_qubits} qubits, "
@@ -3,15 +3,66 @@ Exact density matrix simulation pipeline.
 Implementation based on dev_plane.md specifications.
 """
 
+import functools
+import os
+import string
+from collections import OrderedDict
 import numpy as np
 import time
-from typing import Dict, Any
+from typing import Callable, Optional
 from qiskit import QuantumCircuit, transpile
-from qiskit.quantum_info import DensityMatrix
+from qiskit.quantum_info import DensityMatrix, partial_trace
 from qiskit_aer import AerSimulator
 
-from pipelines.base import SimulationPipeline, SimulationError, ResourceLimitError
-from utils import compute_bloch_vector, compute_purity, clip_tiny_values
+try:
+    import opt_einsum  # type: ignore
+    _HAS_OPT_EINSUM = True
+except Exception:
+    _HAS_OPT_EINSUM = False
+
+from pipelines.base import SimulationPipeline, PipelineResult, STATE_DTYPE, NON_UNITARY_OPS, scratch_buffer, SimulationError, ResourceLimitError, ProgressCallback
+from pipelines.unitary import UnitaryPipeline
+from pipelines._kernels import _HAS_NUMBA
+if _HAS_NUMBA:
+    from pipelines._kernels import reduced_rho
+from utils import compute_bloch_and_purity, circuit_fingerprint
+
+# Reduced states within this of Hermitian with unit trace are used as returned
+HERMITICITY_TOLERANCE = 1e-12
+
+@functools.lru_cache(maxsize=None)
+def aer_device() -> str:
+    """
+    Aer device for density matrix simulation: QSV_AER_DEVICE ('CPU' or 'GPU')
+    if set, otherwise 'GPU' when this Aer build can see a CUDA device.
+    """
+    requested = os.getenv("QSV_AER_DEVICE", "").upper()
+    if requested in ("CPU", "GPU"):
+        return requested
+    try:
+        return "GPU" if "GPU" in AerSimulator().available_devices() else "CPU"
+    except Exception:
+        return "CPU"
+
+@functools.lru_cache(maxsize=None)
+def _partial_trace_contraction(n_qubits: int, target_qubit: int) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Compiled contraction tracing every qubit except target_qubit out of a
+    (2,)*2n density tensor, cached per (n_qubits, target_qubit).
+    
+    Traced qubits reuse one label for their bra and ket axes, so no explicit
+    transpose is needed. Axis k of the bra (and of the ket) is qubit n-1-k,
+    because qubit 0 is the least significant index bit.
+    """
+    target_axis = n_qubits - 1 - target_qubit
+    bra = string.ascii_letters[:n_qubits]
+    ket = bra[:target_axis] + string.ascii_letters[n_qubits] + bra[target_axis + 1:]
+    subscripts = f"{bra}{ket}->{bra[target_axis]}{ket[target_axis]}"
+    shape = (2,) * (2 * n_qubits)
+    if _HAS_OPT_EINSUM:
+        return opt_einsum.contract_expression(subscripts, shape, optimize='auto-hq')
+    path, _ = np.einsum_path(subscripts, np.empty(shape, dtype=STATE_DTYPE), optimize='greedy')
+    return functools.partial(np.einsum, subscripts, optimize=path)
 
 class ExactDensityPipeline(SimulationPipeline):
     """
@@ -24,14 +75,32 @@ class ExactDensityPipeline(SimulationPipeline):
     - Systems where exact density matrix evolution is needed
     
     Implementation details from dev_plane.md:
-    - Use DensityMatrix.from_instruction(circuit)
-    - Partial trace: dm.partial_trace([j for j in range(n_qubits) if j != i])
+    - Evolve with Aer's density_matrix method, saving each qubit's reduced
+      density matrix (Aer does the partial traces)
+    - Fallback: DensityMatrix.from_instruction(circuit), then one einsum per
+      qubit over a reshaped view of the full density matrix
     """
     
-    def __init__(self):
+    # Density matrices scale as 4^n; cap tightened to 8 for safety/perf
+    max_qubits = 8
+    
+    # Transpiled circuits kept per instance, including ones with measurements
+    transpile_cache_size = 64
+    
+    # Aer simulation precision: 'single' (complex64) halves the memory traffic
+    # of the evolution and reductions, 'double' keeps complex128 throughout
+    precision = 'single'
+    
+    def __init__(self, cache: bool = True, precision: Optional[str] = None):
         super().__init__("ExactDensityPipeline")
-        # Density matrices scale as 4^n; cap tightened to 8 for safety/perf
-        self.max_qubits = 8
+        if precision is not None:
+            if precision not in ('single', 'double'):
+                raise ValueError(f"Unknown precision: {precision}")
+            self.precision = precision
+        self._state_dtype = STATE_DTYPE if self.precision == 'single' else np.complex128
+        self._transpile_cache: Optional[OrderedDict] = OrderedDict() if cache else None
+        self._simulator: Optional[AerSimulator] = None
+        self._unitary: Optional[UnitaryPipeline] = None
     
     def validate_circuit(self, circuit: QuantumCircuit) -> bool:
         """
@@ -42,17 +111,16 @@ class ExactDensityPipeline(SimulationPipeline):
         - Handles noise channels (if added later)
         - Limited by memory constraints (4^n scaling)
         """
-        if not super().validate_circuit(circuit):
-            return False
-        
-        # Check qubit limit for density matrix simulation
-        if circuit.num_qubits > self.max_qubits:
-            self.logger.warning(f"Circuit has {circuit.num_qubits} qubits > {self.max_qubits} limit")
+        # Check qubit limit for density matrix simulation (tighter than the global MAX_QUBITS)
+        n_qubits = circuit.num_qubits
+        if n_qubits > self.max_qubits:
+            self.logger.warning(f"Circuit has {n_qubits} qubits > {self.max_qubits} limit")
             return False
         
-        return True
+        return n_qubits > 0
     
-    def run(self, circuit: QuantumCircuit, shots: int = 1024) -> Dict[int, Dict[str, Any]]:
+    def run(self, circuit: QuantumCircuit, shots: int = 1024,
+            progress_cb: Optional[ProgressCallback] = None) -> PipelineResult:
         """
         Run exact density matrix simulation.
         
@@ -74,117 +142,149 @@ class ExactDensityPipeline(SimulationPipeline):
             # Preprocess circuit
             processed_circuit = self.preprocess_circuit(circuit)
             
-            # Simulate full density matrix evolution using Aer density_matrix backend
-            try:
-                sim = AerSimulator(method='density_matrix')
-                circ = processed_circuit.copy()
-                # Ensure final density matrix is saved
-                try:
-                    circ.save_density_matrix()
-                except Exception:
-                    # Older Aer APIs: add via instruction import if needed
-                    from qiskit.providers.aer.library import SaveDensityMatrix  # type: ignore
-                    circ.append(SaveDensityMatrix(), [])
-                tcirc = transpile(circ, sim)
-                result = sim.run(tcirc, shots=1).result()
-                data0 = result.data(0)
-                dm = data0.get('density_matrix', None)
-                if dm is None:
-                    raise RuntimeError("No density_matrix in simulation result")
-                dm_array = np.array(dm, dtype=np.complex128)
-            except Exception as e:
-                # Fallback: try unitary-only path for strictly unitary circuits
+            # Pure states need only the 2^n statevector, not the 4^n density matrix
+            if not any(instr.operation.name in NON_UNITARY_OPS for instr in processed_circuit.data):
                 try:
-                    density_matrix = DensityMatrix.from_instruction(processed_circuit)
-                    dm_array = density_matrix.data
-                except Exception:
-                    raise SimulationError(f"Density matrix simulation failed: {str(e)}", pipeline=self.name)
+                    return self._run_statevector(processed_circuit, shots, progress_cb, start_time)
+                except SimulationError as e:
+                    self.logger.warning(f"Statevector shortcut failed, using density matrix: {e.message}")
             
-            # Compute reduced density matrices for each qubit
-            results = {}
             n_qubits = processed_circuit.num_qubits
+            key = circuit_fingerprint(processed_circuit) if self._transpile_cache is not None else None
+            rhos = self._simulate_reduced(processed_circuit, key)
+            self.report_progress(progress_cb, 60, "Density matrix evolution complete")
             
-            # Wrap full density into Qiskit object once for partial_trace convenience
-            dm_qi = DensityMatrix(dm_array)
-            for qubit_id in range(n_qubits):
-                try:
-                    # Compute reduced density matrix using Qiskit's partial trace
-                    qubits_to_trace = [j for j in range(n_qubits) if j != qubit_id]
-                    
-                    if qubits_to_trace:
-                        # Partial trace over other qubits
-                        rho_reduced = dm_qi.partial_trace(qubits_to_trace)
-                        rho = rho_reduced.data
-                    else:
-                        # Single qubit case - use full density matrix
-                        rho = dm_array
-                    
-                    # Ensure 2x2 matrix
-                    if rho.shape != (2, 2):
-                        self.logger.warning(f"Unexpected density matrix shape {rho.shape} for qubit {qubit_id}")
-                        # Fallback to manual computation
-                        rho = self._compute_reduced_density_matrix_manual(dm_array, n_qubits, qubit_id)
-                    # Enforce Hermiticity and trace normalization defensively
-                    rho = 0.5 * (rho + rho.conj().T)
-                    tr = float(np.trace(rho).real)
-                    if abs(tr) > 1e-15:
-                        rho = rho / tr
-                    
-                    # Compute Bloch coordinates
-                    bloch_coords = compute_bloch_vector(rho)
-                    
-                    # Compute purity
-                    purity = compute_purity(rho)
-                    
-                    # Store results
-                    results[qubit_id] = {
-                        'bloch': bloch_coords,
-                        'purity': purity,
-                        'rho': self._format_density_matrix(rho)
-                    }
-                    
-                except Exception as e:
-                    self.logger.error(f"Failed to compute state for qubit {qubit_id}: {str(e)}")
-                    # Provide fallback state (maximally mixed)
-                    results[qubit_id] = {
-                        'bloch': [0.0, 0.0, 0.0],
-                        'purity': 0.5,
-                        'rho': [[[0.5, 0.0], [0.0, 0.0]], [[0.0, 0.0], [0.5, 0.0]]]
-                    }
+            # Enforce Hermiticity and trace normalization defensively, in double
+            # precision now that the arrays are only (n, 2, 2). States straight
+            # from Aer normally pass both checks, so the fix-ups are skipped.
+            rhos = rhos.astype(np.complex128)
+            if np.any(np.abs(rhos[:, 0, 1] - rhos[:, 1, 0].conj()) > HERMITICITY_TOLERANCE):
+                rhos = 0.5 * (rhos + rhos.conj().transpose(0, 2, 1))
+            traces = rhos[:, 0, 0].real + rhos[:, 1, 1].real
+            if np.any(np.abs(traces - 1.0) > HERMITICITY_TOLERANCE):
+                normalizable = np.abs(traces) > 1e-15
+                rhos[normalizable] /= traces[normalizable, None, None]
+            
+            blochs, purities = compute_bloch_and_purity(rhos)
             
             execution_time = time.time() - start_time
             self.log_simulation_end(execution_time, n_qubits)
+            self.report_progress(progress_cb, 100, "Reduced states computed")
             
-            return self.postprocess_results(results, execution_time)
+            return self.postprocess_results(blochs, purities, rhos, execution_time)
             
         except Exception as e:
             execution_time = time.time() - start_time
             self.logger.error(f"Exact density simulation failed after {execution_time:.3f}s: {str(e)}")
             raise SimulationError(f"Exact density simulation failed: {str(e)}", pipeline=self.name)
     
+    def _run_statevector(self, circuit: QuantumCircuit, shots: int,
+                         progress_cb: Optional[ProgressCallback], start_time: float) -> PipelineResult:
+        """Simulate a unitary-only circuit through the statevector pipeline"""
+        if self._unitary is None:
+            self._unitary = UnitaryPipeline(precision=self.precision)
+        result = self._unitary.run(circuit, shots, progress_cb=progress_cb)
+        result.execution_time = time.time() - start_time
+        result.meta['pipeline'] = self.name
+        return result
+    
+    def _aer_simulator(self) -> AerSimulator:
+        """Density matrix simulator for this instance's precision, created once"""
+        if self._simulator is None:
+            self._simulator = AerSimulator(method='density_matrix', precision=self.precision,
+                                           device=aer_device())
+        return self._simulator
+    
+    def _transpiled(self, circ: QuantumCircuit, sim: AerSimulator, key: Optional[bytes]) -> QuantumCircuit:
+        """
+        Transpile circ for sim, reusing the result for a circuit fingerprint seen before.
+        
+        The pass manager run dominates wall time for small circuits, where the
+        density matrix evolution itself is cheap.
+        """
+        if key is None or self._transpile_cache is None:
+            return transpile(circ, sim)
+        tcirc = self._transpile_cache.get(key)
+        if tcirc is None:
+            tcirc = self._transpile_cache[key] = transpile(circ, sim)
+            if len(self._transpile_cache) > self.transpile_cache_size:
+                self._transpile_cache.popitem(last=False)
+        else:
+            self._transpile_cache.move_to_end(key)
+        return tcirc
+    
+    def _simulate_reduced(self, processed_circuit: QuantumCircuit, key: Optional[bytes] = None) -> np.ndarray:
+        """
+        Simulate density matrix evolution with Aer and return every qubit's
+        reduced density matrix.
+        
+        Aer saves one single-qubit density matrix per qubit and computes the
+        partial traces itself, so the full 4^n matrix never reaches Python.
+        If Aer fails, the full matrix from Qiskit's DensityMatrix is reduced here.
+        key is the circuit's fingerprint, if known, for the transpile cache.
+        """
+        n_qubits = processed_circuit.num_qubits
+        try:
+            sim = self._aer_simulator()
+            # Saves go on after transpiling: each touches a single wire, so the
+            # transpiler could otherwise hoist it above a measurement elsewhere
+            tcirc = self._transpiled(processed_circuit, sim, key).copy()
+            for qubit_id in range(n_qubits):
+                tcirc.save_density_matrix(qubits=[qubit_id], label=f"rho{qubit_id}")
+            data0 = sim.run(tcirc, shots=1).result().data(0)
+            return np.stack([np.asarray(data0[f"rho{qubit_id}"]) for qubit_id in range(n_qubits)])
+        except Exception as e:
+            self.logger.warning(f"Aer reduced density matrices unavailable: {str(e)}")
+            # Fallback: full density matrix, reduced on our side
+            try:
+                full = DensityMatrix.from_instruction(processed_circuit).data
+                dm_array = scratch_buffer(full.shape, self._state_dtype)
+                np.copyto(dm_array, full, casting='same_kind')
+            except Exception:
+                raise SimulationError(f"Density matrix simulation failed: {str(e)}", pipeline=self.name)
+        try:
+            return self._reduced_density_matrices(dm_array, n_qubits)
+        except Exception as e:
+            self.logger.error(f"Batched partial trace failed: {str(e)}")
+            return np.stack([
+                self._compute_reduced_density_matrix_manual(dm_array, n_qubits, qubit_id)
+                for qubit_id in range(n_qubits)
+            ])
+    
+    def _reduced_density_matrices(self, dm_array: np.ndarray, n_qubits: int) -> np.ndarray:
+        """
+        Reduced density matrices of every qubit, stacked as (n_qubits, 2, 2).
+        
+        Each qubit's reduction is an einsum over a reshaped view of the same
+        array (qubit 0 is the least significant index bit). The repeated indices
+        make einsum walk only the 4 * 2^(n-1) entries that survive the trace,
+        not all 4^n.
+        """
+        dim = 1 << n_qubits
+        rhos = np.empty((n_qubits, 2, 2), dtype=dm_array.dtype)
+        for qubit_id in range(n_qubits):
+            inner = 1 << qubit_id           # qubits below the target
+            outer = dim >> (qubit_id + 1)   # qubits above the target
+            dm_view = dm_array.reshape(outer, 2, inner, outer, 2, inner)
+            rhos[qubit_id] = np.einsum('iajibj->ab', dm_view)
+        return rhos
+    
     def _compute_reduced_density_matrix_manual(self, dm_full: np.ndarray, n_qubits: int, 
                                              target_qubit: int) -> np.ndarray:
         """
-        Manual computation of reduced density matrix when Qiskit method fails.
+        Per-qubit reduced density matrix, used when the batched reduction fails.
         """
         try:
             if n_qubits == 1:
                 # Already 2x2
                 rho = dm_full
+            elif _HAS_NUMBA:
+                # Compiled loop over the surviving entries only
+                rho = np.empty((2, 2), dtype=dm_full.dtype)
+                reduced_rho(dm_full, n_qubits, target_qubit, rho)
             else:
-                # Reshape to (2,)*n (bra) + (2,)*n (ket)
-                shape = (2,) * (2 * n_qubits)
-                dm_tensor = dm_full.reshape(shape)
-                # Bring target bra axis first, target ket axis next block start
-                perm = (target_qubit,
-                        *[i for i in range(n_qubits) if i != target_qubit],
-                        target_qubit + n_qubits,
-                        *[i + n_qubits for i in range(n_qubits) if i != target_qubit])
-                dm_perm = dm_tensor.transpose(perm)
-                # Now shape is (2, 2^(n-1), 2, 2^(n-1)); trace over middle dims (diagonal)
-                m = 1 << (n_qubits - 1)
-                dm_shaped = dm_perm.reshape(2, m, 2, m)
-                rho = np.einsum('aibi->ab', dm_shaped)
+                contraction = _partial_trace_contraction(n_qubits, target_qubit)
+                rho = contraction(dm_full.reshape((2,) * (2 * n_qubits)))
             # Defensive normalization and Hermiticity
             rho = 0.5 * (rho + rho.conj().T)
             tr = float(np.trace(rho).real)
@@ -193,20 +293,14 @@ class ExactDensityPipeline(SimulationPipeline):
             return rho.astype(np.complex128)
         except Exception as e:
             self.logger.warning(f"Manual density matrix computation failed: {e}")
+        try:
+            # Last resort: Qiskit's partial trace on the raw array
+            qubits_to_trace = [*range(target_qubit), *range(target_qubit + 1, n_qubits)]
+            return partial_trace(dm_full, qubits_to_trace).data.astype(np.complex128)
+        except Exception as e:
+            self.logger.warning(f"Qiskit partial trace failed: {e}")
             return np.array([[0.5+0j, 0.0+0j], [0.0+0j, 0.5+0j]], dtype=np.complex128)
     
-    def _format_density_matrix(self, rho: np.ndarray) -> list:
-        """Format density matrix for JSON serialization as [[re,im],...]."""
-        formatted = []
-        for i in range(2):
-            row = []
-            for j in range(2):
-                real = clip_tiny_values(rho[i, j].real)
-                imag = clip_tiny_values(rho[i, j].imag)
-                row.append([float(real), float(imag)])
-            formatted.append(row)
-        return formatted
-    
     def _estimate_memory(self, n_qubits: int) -> float:
         """Estimate memory usage for density matrix simulation"""
         # Full density matrix: 4^n complex numbers * 16 bytes/complex
@@ -235,11 +329,13 @@ class ExactDensityPipeline(SimulationPipeline):
         # - Optimize measurement handling
         return circuit
     
-    def supports_measurements(self) -> bool:
+    @classmethod
+    def supports_measurements(cls) -> bool:
         """This pipeline supports measurements"""
         return True
     
-    def supports_noise(self) -> bool:
+    @classmethod
+    def supports_noise(cls) -> bool:
         """This pipeline can support noise (when implemented)"""
         return True
     
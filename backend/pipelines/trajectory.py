@@ -4,14 +4,40 @@ Implements true Monte Carlo sampling with projective measurement collapse per sh
 matching the dev_plan specification (stochastic trajectories averaged to density).
 """
 
+import os
+from collections import OrderedDict
 import numpy as np
 import time
-from typing import Dict, Any, List
-from qiskit import QuantumCircuit
-from qiskit.quantum_info import DensityMatrix, Statevector
+from typing import Dict, Any, List, Optional, Tuple
+from qiskit import QuantumCircuit, transpile
+from qiskit.quantum_info import Statevector
+from qiskit_aer import AerSimulator
 
-from pipelines.base import SimulationPipeline, SimulationError, UnsupportedCircuitError
-from utils import compute_bloch_vector, compute_purity, clip_tiny_values
+from pipelines.base import SimulationPipeline, PipelineResult, STATE_DTYPE, SimulationError, UnsupportedCircuitError, ProgressCallback
+from pipelines._kernels import _HAS_NUMBA
+if _HAS_NUMBA:
+    from pipelines._kernels import measure_collapse, reset_qubit, apply_matrix
+from pipelines.unitary import all_single_qubit_rdms
+from utils import compute_bloch_and_purity, circuit_fingerprint
+
+# Aer threads for the shots of one batched run (QSV_TRAJECTORY_THREADS, default 1).
+# Large runs are already split into shot chunks across the simulation pool, one
+# worker per core, so only raise this when the pipeline runs outside that pool.
+TRAJECTORY_THREADS = int(os.getenv("QSV_TRAJECTORY_THREADS", "1"))
+
+# Stop once every Bloch component's standard error is below this
+# (QSV_TRAJECTORY_TOLERANCE, default 0 = always run the requested shots)
+CONVERGENCE_TOLERANCE = float(os.getenv("QSV_TRAJECTORY_TOLERANCE", "0"))
+
+# Instructions that collapse the state (Qiskit operation names are lowercase)
+MEASUREMENT_OPS = frozenset(('measure', 'reset'))
+
+# Diagonal single-qubit gates, as the phase they put on the |1> amplitudes
+# (Python scalars, so they keep the state's dtype)
+PHASE_GATES = {'z': -1.0, 's': 1j, 'sdg': -1j,
+               't': complex(np.exp(1j * np.pi / 4)), 'tdg': complex(np.exp(-1j * np.pi / 4))}
+# Permutation and phase gates the collapse engine applies without a matrix, by width
+NAMED_GATES = {**{name: 1 for name in PHASE_GATES}, 'x': 1, 'y': 1, 'cx': 2, 'cz': 2, 'swap': 2}
 
 class TrajectoryPipeline(SimulationPipeline):
     """
@@ -24,15 +50,35 @@ class TrajectoryPipeline(SimulationPipeline):
     - Non-unitary circuits with ≤16 qubits and ≥1000 shots (routing condition)
     
     Implementation details from dev_plane.md:
-    - Loop S times: Simulate with stochastic collapses (use Qiskit's Aer simulator with shots=1)
+    - Simulate S shots with stochastic collapses (Aer multi-shot jobs saving each shot's statevector,
+      or an explicit collapse walk per shot as fallback)
     - Average RDMs over trajectories
     """
     
-    def __init__(self):
+    max_qubits = 16  # As specified in routing logic
+    
+    # Per-shot final statevectors held at once by a batched Aer run
+    aer_batch_bytes = 64 * 1024 * 1024
+    # Transpiled circuits kept per instance, keyed by circuit fingerprint
+    transpile_cache_size = 64
+    # Collapse-engine tapes kept per instance, keyed the same way
+    tape_cache_size = 64
+    # Shots between convergence checks when a tolerance is set
+    convergence_check_shots = 256
+    
+    # Aer precision for the batched runs, and the amplitude dtype of the
+    # collapse engine ('single' = STATE_DTYPE); shot noise dwarfs
+    # single-precision rounding, and the batches are reduced in complex64 anyway
+    precision = 'single'
+    
+    def __init__(self, tolerance: Optional[float] = None):
         super().__init__("TrajectoryPipeline")
-        self.max_qubits = 16  # As specified in routing logic
         self.min_shots = 100   # Minimum for meaningful statistics
         self.max_shots = 100000  # Practical upper limit
+        self.convergence_tolerance = CONVERGENCE_TOLERANCE if tolerance is None else tolerance
+        self._simulator: Optional[AerSimulator] = None
+        self._transpile_cache: OrderedDict = OrderedDict()
+        self._tape_cache: OrderedDict = OrderedDict()
     
     def validate_circuit(self, circuit: QuantumCircuit) -> bool:
         """
@@ -43,26 +89,20 @@ class TrajectoryPipeline(SimulationPipeline):
         - ≤ 16 qubits for reasonable simulation time
         - Simulator must be available
         """
-        if not super().validate_circuit(circuit):
+        # Check qubit limit (tighter than the global MAX_QUBITS)
+        n_qubits = circuit.num_qubits
+        if n_qubits > self.max_qubits:
+            self.logger.warning(f"Circuit has {n_qubits} qubits > {self.max_qubits} limit")
             return False
-        
-        # Check qubit limit
-        if circuit.num_qubits > self.max_qubits:
-            self.logger.warning(f"Circuit has {circuit.num_qubits} qubits > {self.max_qubits} limit")
+        if n_qubits <= 0:
             return False
         
-        # Check for non-unitary operations (preferred for trajectory method)
-        has_measurements = any(
-            instr.operation.name.lower() in ['measure', 'reset']
-            for instr in circuit.data
-        )
-        
-        if not has_measurements:
-            self.logger.info("Circuit is unitary - trajectory simulation still supported")
-        
+        # Unitary circuits are accepted too; run() notes them when it scans
+        # for measurements
         return True
     
-    def run(self, circuit: QuantumCircuit, shots: int = 1024) -> Dict[int, Dict[str, Any]]:
+    def run(self, circuit: QuantumCircuit, shots: int = 1024,
+            progress_cb: Optional[ProgressCallback] = None) -> PipelineResult:
         """
         Run trajectory-based simulation with quantum Monte Carlo sampling.
         """
@@ -87,17 +127,22 @@ class TrajectoryPipeline(SimulationPipeline):
                 self.logger.warning(f"High shot count {shots} clamped to {self.max_shots}")
                 shots = self.max_shots
             
+            # One scan for measurements, shared with preprocessing
+            has_measurements = self._has_measurements(circuit)
+            if not has_measurements:
+                self.logger.info("Circuit is unitary - trajectory simulation still supported")
+            
             # Preprocess circuit for trajectory simulation
-            processed_circuit = self.preprocess_circuit(circuit)
+            processed_circuit = self.preprocess_circuit(circuit, has_measurements)
             
             # Run trajectory simulation
             # Always run trajectory engine (unitary circuits will be consistent across shots)
-            results = self._run_trajectories(processed_circuit, shots)
+            rhos = self._run_trajectories(processed_circuit, shots, progress_cb)
             
             execution_time = time.time() - start_time
             self.log_simulation_end(execution_time, processed_circuit.num_qubits)
             
-            return self.postprocess_results(results, execution_time)
+            return self.postprocess_results(*compute_bloch_and_purity(rhos), rhos, execution_time)
             
         except Exception as e:
             execution_time = time.time() - start_time
@@ -105,138 +150,342 @@ class TrajectoryPipeline(SimulationPipeline):
             raise SimulationError(f"Trajectory simulation failed: {str(e)}", pipeline=self.name)
     
     def _has_measurements(self, circuit: QuantumCircuit) -> bool:
-        """Check if circuit contains measurement operations"""
-        return any(
-            instr.operation.name.lower() in ['measure', 'reset']
-            for instr in circuit.data
-        )
+        """Check if circuit contains measurement or reset operations, stopping at the first"""
+        return any(instr.operation.name in MEASUREMENT_OPS for instr in circuit.data)
     
-    def _run_trajectories(self, circuit: QuantumCircuit, shots: int) -> Dict[int, Dict[str, Any]]:
+    def _run_trajectories(self, circuit: QuantumCircuit, shots: int,
+                          progress_cb: Optional[ProgressCallback] = None) -> np.ndarray:
         """
         Run Monte Carlo trajectories with projective measurement collapse.
         Each trajectory walks through the circuit instruction-by-instruction,
         sampling measurement outcomes and collapsing the statevector.
+        
+        Returns the (n_qubits, 2, 2) trajectory-averaged reduced density matrices.
         """
+        try:
+            return self._run_aer_trajectories(circuit, shots, progress_cb)
+        except Exception as e:
+            self.logger.warning(f"Batched Aer trajectories unavailable, collapsing shot by shot: {e}")
+        
         n_qubits = circuit.num_qubits
 
-        # Accumulate density matrices from all trajectories
-        accumulated_rhos = {i: np.zeros((2, 2), dtype=np.complex128) for i in range(n_qubits)}
+        # Averaging is linear, so accumulate the real Pauli components
+        # (<I>, <X>, <Y>, <Z>) per qubit and rebuild the matrices at the end
+        accumulated = np.zeros((n_qubits, 4), dtype=np.float64)
+        # Per-component sums of squares for the convergence check
+        squares = np.zeros((n_qubits, 3), dtype=np.float64)
         valid_trajectories = 0
+        # Report roughly every 10% of the shot budget
+        progress_every = max(1, shots // 10)
 
+        tape = self._cached_tape(circuit)
+        # One uniform per measurement or reset, drawn for a whole trajectory at
+        # once from a generator seeded off the global RNG (so seeded chunks
+        # stay reproducible and distinct)
+        n_draws = sum(entry[0] in MEASUREMENT_OPS for entry in tape)
+        rng = np.random.default_rng(np.random.randint(2**31))
         for t in range(shots):
             try:
-                state, clbits = self._simulate_single_trajectory(circuit)
+                state, clbits = self._simulate_single_trajectory(circuit, tape, rng.random(n_draws))
                 if state is None:
                     continue
-                # Extract reduced density matrices for each qubit and accumulate
-                state_array = state.data if isinstance(state, Statevector) else np.asarray(state)
-                for qubit_id in range(n_qubits):
-                    rho_traj = self._compute_reduced_density_matrix(state_array, n_qubits, qubit_id)
-                    accumulated_rhos[qubit_id] += rho_traj
+                # Extract reduced density matrices for all qubits and accumulate
+                components = self._pauli_components(self._compute_all_single_qubit_rdms(state, n_qubits))
+                accumulated += components
+                squares += components[:, 1:] ** 2
                 valid_trajectories += 1
+                if valid_trajectories % self.convergence_check_shots == 0 and \
+                        self._converged(accumulated[:, 1:], squares, valid_trajectories):
+                    self.logger.info(f"Converged after {valid_trajectories} trajectories")
+                    break
             except Exception as e:
                 self.logger.warning(f"Trajectory {t} failed: {e}")
                 continue
+            finally:
+                if (t + 1) % progress_every == 0:
+                    self.report_progress(progress_cb, (t + 1) * 100 // shots,
+                                         f"{t + 1}/{shots} trajectories simulated")
 
         if valid_trajectories == 0:
             raise SimulationError("All trajectories failed", pipeline=self.name)
 
-        # Average and produce results
-        results = {}
-        for qubit_id in range(n_qubits):
-            avg_rho = accumulated_rhos[qubit_id] / valid_trajectories
-            # Normalize to trace 1
-            tr = np.trace(avg_rho)
-            if abs(tr) > 1e-12:
-                avg_rho = avg_rho / tr
-            bloch_coords = compute_bloch_vector(avg_rho)
-            purity = compute_purity(avg_rho)
-            results[qubit_id] = {
-                'bloch': bloch_coords,
-                'purity': purity,
-                'rho': self._format_density_matrix(avg_rho)
-            }
+        # Average and normalize each qubit to trace 1
+        averaged = accumulated / valid_trajectories
+        traces = averaged[:, 0]
+        normalizable = np.abs(traces) > 1e-12
+        averaged[normalizable] /= traces[normalizable, None]
 
         self.logger.info(f"Completed {valid_trajectories}/{shots} trajectories successfully")
-        return results
+        return self._rhos_from_pauli_components(averaged)
+    
+    @staticmethod
+    def _pauli_components(rhos: np.ndarray) -> np.ndarray:
+        """(n, 4) real components (Tr ρ, 2Re ρ01, -2Im ρ01, ρ00 - ρ11) of an (n, 2, 2) stack"""
+        components = np.empty((rhos.shape[0], 4), dtype=np.float64)
+        rho_00 = rhos[:, 0, 0].real
+        rho_11 = rhos[:, 1, 1].real
+        components[:, 0] = rho_00 + rho_11
+        components[:, 1] = 2.0 * rhos[:, 0, 1].real
+        components[:, 2] = -2.0 * rhos[:, 0, 1].imag
+        components[:, 3] = rho_00 - rho_11
+        return components
     
-    def _run_unitary_trajectories(self, circuit: QuantumCircuit, shots: int) -> Dict[int, Dict[str, Any]]:
-        """Deprecated in favor of _run_trajectories which handles both cases."""
-        return self._run_trajectories(circuit, max(1, shots))
+    @staticmethod
+    def _rhos_from_pauli_components(components: np.ndarray) -> np.ndarray:
+        """Inverse of _pauli_components: ρ = (<I> I + <X> X + <Y> Y + <Z> Z) / 2"""
+        trace, x, y, z = components.T
+        rhos = np.empty((components.shape[0], 2, 2), dtype=np.complex128)
+        rhos[:, 0, 0] = 0.5 * (trace + z)
+        rhos[:, 1, 1] = 0.5 * (trace - z)
+        rhos[:, 0, 1] = 0.5 * (x - 1j * y)
+        rhos[:, 1, 0] = 0.5 * (x + 1j * y)
+        return rhos
     
-    def _simulate_single_trajectory(self, circuit: QuantumCircuit):
+    @property
+    def state_dtype(self) -> np.dtype:
+        """Amplitude dtype of the collapse engine for the configured precision"""
+        return np.dtype(STATE_DTYPE if self.precision == 'single' else np.complex128)
+    
+    def _aer_simulator(self) -> AerSimulator:
+        """Statevector simulator for batched trajectories, created once"""
+        if self._simulator is None:
+            self._simulator = AerSimulator(method='statevector', precision=self.precision,
+                                           max_parallel_threads=TRAJECTORY_THREADS)
+        return self._simulator
+    
+    def _run_aer_trajectories(self, circuit: QuantumCircuit, shots: int,
+                              progress_cb: Optional[ProgressCallback] = None) -> np.ndarray:
+        """
+        Run the trajectories as a few multi-shot Aer jobs instead of one
+        collapse walk per shot.
+        
+        Aer samples every measurement per shot and saves each shot's final
+        statevector; shots are split into batches of at most aer_batch_bytes
+        of statevectors. Seeds come from NumPy's global RNG, so seeded chunks
+        stay reproducible and distinct. With a convergence tolerance, batches
+        shrink to convergence_check_shots and each shot's Bloch vector is kept
+        so the run can stop early.
+        """
+        n_qubits = circuit.num_qubits
+        sim = self._aer_simulator()
+        tcirc = self._prepared_circuit(circuit)
+        batch_size = max(1, min(shots, self.aer_batch_bytes // (16 << n_qubits)))
+        if self.convergence_tolerance > 0:
+            batch_size = min(batch_size, self.convergence_check_shots)
+        
+        accumulated = np.zeros((n_qubits, 4), dtype=np.float64)
+        squares = np.zeros((n_qubits, 3), dtype=np.float64)
+        completed = 0
+        while completed < shots:
+            batch_shots = min(batch_size, shots - completed)
+            seed = int(np.random.randint(2**31))
+            # Thread fan-out only pays off once each thread gets a few hundred shots
+            parallel_shots = TRAJECTORY_THREADS if batch_shots >= 4 * self.min_shots else 1
+            states = sim.run(tcirc, shots=batch_shots, seed_simulator=seed,
+                             max_parallel_shots=parallel_shots).result().data(0)["psi"]
+            # Shot noise dwarfs single-precision rounding, so reduce the batch in
+            # complex64; the (n, 4) accumulator stays float64 across batches
+            states = np.stack([np.asarray(state) for state in states], dtype=STATE_DTYPE)
+            if self.convergence_tolerance > 0:
+                shot_blochs = self._shot_bloch_vectors(states, n_qubits)
+                accumulated[:, 0] += batch_shots
+                accumulated[:, 1:] += shot_blochs.sum(axis=0)
+                squares += (shot_blochs ** 2).sum(axis=0)
+            else:
+                rhos = self._compute_all_single_qubit_rdms(states, n_qubits)
+                accumulated += batch_shots * self._pauli_components(rhos)
+            completed += batch_shots
+            self.report_progress(progress_cb, completed * 100 // shots,
+                                 f"{completed}/{shots} trajectories simulated")
+            if completed < shots and self._converged(accumulated[:, 1:], squares, completed):
+                self.logger.info(f"Converged after {completed}/{shots} trajectories")
+                break
+        
+        accumulated /= completed
+        return self._rhos_from_pauli_components(accumulated)
+    
+    @staticmethod
+    def _shot_bloch_vectors(states: np.ndarray, n_qubits: int) -> np.ndarray:
+        """(shots, n_qubits, 3) Bloch vectors of every qubit in each normalized statevector of a stack"""
+        n_shots = states.shape[0]
+        blochs = np.empty((n_shots, n_qubits, 3), dtype=np.float64)
+        for qubit_id in range(n_qubits):
+            halves = states.reshape(n_shots, -1, 2, 1 << qubit_id)
+            zero = halves[:, :, 0, :]
+            one = halves[:, :, 1, :]
+            coherence = np.einsum('sri,sri->s', zero, one.conj())
+            p0 = np.einsum('sri,sri->s', zero, zero.conj()).real
+            p1 = np.einsum('sri,sri->s', one, one.conj()).real
+            blochs[:, qubit_id, 0] = 2.0 * coherence.real
+            blochs[:, qubit_id, 1] = -2.0 * coherence.imag
+            blochs[:, qubit_id, 2] = p0 - p1
+        return blochs
+    
+    def _converged(self, sums: np.ndarray, squares: np.ndarray, count: int) -> bool:
+        """
+        True once count trajectories (at least min_shots) put the standard error
+        of every Bloch component below convergence_tolerance.
+        """
+        if self.convergence_tolerance <= 0 or count < self.min_shots:
+            return False
+        mean = sums / count
+        variance = np.maximum(squares / count - mean ** 2, 0.0)
+        return float(np.sqrt(variance.max() / count)) < self.convergence_tolerance
+    
+    def _prepared_circuit(self, circuit: QuantumCircuit) -> QuantumCircuit:
+        """
+        Circuit transpiled for the batched simulator with the per-shot
+        statevector save appended, reused for a circuit fingerprint seen before.
+        """
+        key = circuit_fingerprint(circuit)
+        tcirc = self._transpile_cache.get(key)
+        if tcirc is None:
+            tcirc = transpile(circuit, self._aer_simulator())
+            tcirc.save_statevector(label="psi", pershot=True)
+            self._transpile_cache[key] = tcirc
+            if len(self._transpile_cache) > self.transpile_cache_size:
+                self._transpile_cache.popitem(last=False)
+        else:
+            self._transpile_cache.move_to_end(key)
+        return tcirc
+    
+    def _cached_tape(self, circuit: QuantumCircuit) -> List[tuple]:
+        """_trajectory_tape of circuit, reused for a circuit fingerprint seen before"""
+        key = circuit_fingerprint(circuit)
+        tape = self._tape_cache.get(key)
+        if tape is None:
+            tape = self._tape_cache[key] = self._trajectory_tape(circuit)
+            if len(self._tape_cache) > self.tape_cache_size:
+                self._tape_cache.popitem(last=False)
+        else:
+            self._tape_cache.move_to_end(key)
+        return tape
+    
+    def _trajectory_tape(self, circuit: QuantumCircuit) -> List[tuple]:
+        """
+        Per-instruction data the collapse engine needs, resolved once per run
+        instead of once per shot.
+        
+        Each entry is (name, operation, qargs, clbit, condition, named, matrix, step):
+        qubit and clbit indices, the condition as (clbit indices, value) or False
+        when it cannot be parsed (the instruction is then always skipped), and
+        for unitary operations either named=True for NAMED_GATES, the gate
+        matrix when it acts on one or two qubits, or a one-instruction circuit
+        to evolve by.
+        """
+        n_qubits = circuit.num_qubits
+        qubit_index = {qb: idx for idx, qb in enumerate(circuit.qubits)}
+        clbit_index = {cb: idx for idx, cb in enumerate(circuit.clbits)}
+        tape = []
+        for instr in circuit.data:
+            op = instr.operation
+            name = op.name.lower()
+            qargs = [qubit_index[q] for q in instr.qubits]
+            clbit = clbit_index.get(instr.clbits[0]) if instr.clbits else None
+            
+            condition = None
+            if getattr(op, "condition", None) is not None:
+                try:
+                    # (ClassicalRegister or Clbit, int); a single Clbit acts as a 1-bit register
+                    reg, val = op.condition
+                    bits = reg.bits if hasattr(reg, "bits") else [reg]
+                    condition = ([clbit_index.get(b) for b in bits], val)
+                except Exception:
+                    condition = False
+            
+            named = NAMED_GATES.get(name) == len(qargs) and not op.params
+            matrix = None
+            step = None
+            if name not in MEASUREMENT_OPS and not named and len(qargs) <= 2:
+                try:
+                    matrix = np.asarray(op.to_matrix(), dtype=self.state_dtype)
+                except Exception:
+                    matrix = None
+            if name not in MEASUREMENT_OPS and not named and matrix is None:
+                try:
+                    # A minimal circuit with the same number of qubits, op at the right qargs
+                    step = QuantumCircuit(n_qubits)
+                    step.append(op, qargs)
+                except Exception:
+                    step = None
+            tape.append((name, op, qargs, clbit, condition, named, matrix, step))
+        return tape
+    
+    def _simulate_single_trajectory(self, circuit: QuantumCircuit, tape: Optional[List[tuple]] = None,
+                                    draws: Optional[np.ndarray] = None):
         """
         Simulate a single trajectory with explicit projective measurement collapse.
-        Returns (Statevector, classical_bits_dict).
+        Pass the circuit's _trajectory_tape when running many shots, and
+        optionally draws, one uniform sample per measurement or reset on the
+        tape (otherwise they come from np.random).
+        Returns (statevector array, classical_bits_dict); the amplitudes stay a
+        raw state_dtype array for the whole walk.
         """
         try:
             n_qubits = circuit.num_qubits
+            if tape is None:
+                tape = self._trajectory_tape(circuit)
             # Start in |0...0>
-            state = Statevector.from_int(0, 2**n_qubits)
+            state = np.zeros(1 << n_qubits, dtype=self.state_dtype)
+            state[0] = 1.0
             # Classical bits mapping: clbit index -> 0/1
             clbits: Dict[int, int] = {}
+            if draws is None:
+                draws = np.random.random(sum(entry[0] in MEASUREMENT_OPS for entry in tape))
+            n_drawn = 0
 
-            # Build a helper mapping from circuit qubits/clbits to indices
-            qubit_index = {qb: idx for idx, qb in enumerate(circuit.qubits)}
-            clbit_index = {cb: idx for idx, cb in enumerate(circuit.clbits)}
-
-            for instr in circuit.data:
-                name = instr.operation.name.lower()
-
+            for name, op, qargs, clbit, condition, named, matrix, step in tape:
                 # Handle classical condition (if present)
-                if getattr(instr.operation, "condition", None) is not None:
-                    cond = instr.operation.condition  # (ClassicalRegister or Clbit, int)
-                    try:
-                        reg, val = cond
-                        # Compute integer value of bits in this register
-                        # If reg is a single Clbit, treat it as 1-bit register
-                        if hasattr(reg, "bits"):
-                            bits = reg.bits
-                        else:
-                            bits = [reg]
-                        current = 0
-                        for i, b in enumerate(bits):
-                            idx = clbit_index.get(b, None)
-                            bitval = clbits.get(idx, 0) if idx is not None else 0
-                            current |= (bitval & 1) << i
-                        if current != val:
-                            # Skip this instruction if condition not satisfied
-                            continue
-                    except Exception:
-                        # If condition parsing fails, conservatively skip
+                if condition is not None:
+                    if condition is False:
+                        # Condition could not be parsed; conservatively skip
+                        continue
+                    bit_indices, val = condition
+                    # Compute integer value of bits in this register
+                    current = 0
+                    for i, idx in enumerate(bit_indices):
+                        bitval = clbits.get(idx, 0) if idx is not None else 0
+                        current |= (bitval & 1) << i
+                    if current != val:
+                        # Skip this instruction if condition not satisfied
                         continue
 
                 if name == 'measure':
                     # measurement: measure q -> c
-                    q = instr.qubits[0]
-                    c = instr.clbits[0] if instr.clbits else None
-                    q_idx = qubit_index[q]
-                    outcome, state = self._measure_and_collapse(state.data, n_qubits, q_idx)
-                    if c is not None:
-                        c_idx = clbit_index.get(c, None)
-                        if c_idx is not None:
-                            clbits[c_idx] = int(outcome)
+                    outcome, state = self._measure_and_collapse(state, n_qubits, qargs[0], draws[n_drawn])
+                    n_drawn += 1
+                    if clbit is not None:
+                        clbits[clbit] = int(outcome)
                     continue
 
                 if name == 'reset':
-                    q = instr.qubits[0]
-                    q_idx = qubit_index[q]
-                    state = Statevector(self._reset_qubit(state.data, n_qubits, q_idx))
+                    state = self._reset_qubit(state, n_qubits, qargs[0], draws[n_drawn])
+                    n_drawn += 1
+                    continue
+
+                # Permutation and phase gates: slice swaps and scalings in place
+                if named:
+                    self._apply_named_gate(state, name, n_qubits, qargs)
+                    continue
+
+                # One- and two-qubit gates: stride-pair update of the raw amplitudes
+                if matrix is not None:
+                    if len(qargs) == 1:
+                        state = self._apply_1q(state, matrix, qargs[0])
+                    else:
+                        state = self._apply_2q(state, matrix, n_qubits, qargs)
                     continue
 
                 # Unitary operation: evolve state by this operation
                 try:
-                    op = instr.operation
-                    # Build a minimal circuit with the same number of qubits, append op at the right qargs
-                    tmp = QuantumCircuit(n_qubits)
-                    tmp.append(op, [qubit_index[q] for q in instr.qubits])
-                    state = state.evolve(tmp)
+                    if step is None:
+                        raise SimulationError(f"Could not build a circuit for {name}")
+                    state = Statevector(state).evolve(step).data.astype(self.state_dtype)
                 except Exception as e:
                     # If evolve fails, try to_matrix fallback
                     try:
                         mat = op.to_matrix()
-                        qargs = [qubit_index[q] for q in instr.qubits]
-                        state = Statevector(self._apply_matrix_to_qubits(state.data, mat, n_qubits, qargs))
+                        state = self._apply_matrix_to_qubits(state, mat, n_qubits, qargs)
                     except Exception as e2:
                         raise SimulationError(f"Failed to apply instruction {name}: {e2}")
 
@@ -248,85 +497,149 @@ class TrajectoryPipeline(SimulationPipeline):
 
     # Removed simplified measurement handling in favor of explicit collapse engine
     
-    def _extract_qubit_state(self, trajectory_result, n_qubits: int, qubit_id: int) -> np.ndarray:
-        """Extract single qubit density matrix from trajectory result (statevector)."""
-        try:
-            state_array = trajectory_result.data if isinstance(trajectory_result, Statevector) else np.asarray(trajectory_result)
-            return self._compute_reduced_density_matrix(state_array, n_qubits, qubit_id)
-        except Exception as e:
-            self.logger.warning(f"Failed to extract qubit state: {e}")
-            return np.array([[0.5+0j, 0.0+0j], [0.0+0j, 0.5+0j]], dtype=np.complex128)
-    
-    def _compute_reduced_density_matrix(self, state_vector: np.ndarray, n_qubits: int, 
-                                      target_qubit: int) -> np.ndarray:
-        """Vectorized single-qubit RDM from a statevector (little-endian qubit 0)."""
-        if n_qubits == 1:
-            v = state_vector.reshape(2, 1)
-            return (v @ v.conj().T).astype(np.complex128)
-        shape = (2,) * n_qubits
-        # Map little-endian qubit index to reshape axis
-        target_axis = n_qubits - 1 - target_qubit
-        axes = (target_axis,) + tuple(i for i in range(n_qubits) if i != target_axis)
-        V = state_vector.reshape(shape).transpose(axes).reshape(2, -1)
-        rho = V @ V.conj().T
-        tr = float(np.trace(rho).real)
-        if abs(tr) > 1e-15:
-            rho = rho / tr
-        rho = 0.5 * (rho + rho.conj().T)
-        return rho.astype(np.complex128)
+    def _compute_all_single_qubit_rdms(self, state_vector: np.ndarray, n_qubits: int) -> np.ndarray:
+        """
+        Reduced density matrices of every qubit from one statevector, as (n_qubits, 2, 2).
+        A (shots, 2^n) stack of normalized statevectors gives the shot-averaged
+        reduced states, since the shot index is summed with the traced qubits.
+        """
+        return all_single_qubit_rdms(state_vector, n_qubits)
 
-    def _measure_and_collapse(self, state_vector: np.ndarray, n_qubits: int, target_qubit: int):
+    def _measure_and_collapse(self, state_vector: np.ndarray, n_qubits: int, target_qubit: int,
+                              rnd: Optional[float] = None):
         """
         Perform a projective measurement on target_qubit, return (outcome, new_state_vector).
+        rnd is the uniform sample deciding the outcome (drawn from np.random if None).
+        state_vector is collapsed in place (a contiguous copy of it when it is
+        not contiguous) and returned, without allocating a new state.
         """
-        # Compute probabilities for |0> and |1> on target qubit
-        p0 = 0.0
-        p1 = 0.0
-        dim = 2 ** n_qubits
-        mask = 1 << target_qubit
-        for idx in range(dim):
-            amp = state_vector[idx]
-            if (idx & mask) == 0:
-                p0 += (amp.real * amp.real + amp.imag * amp.imag)
-            else:
-                p1 += (amp.real * amp.real + amp.imag * amp.imag)
+        if rnd is None:
+            rnd = np.random.random()
+        if _HAS_NUMBA:
+            state_vector = np.ascontiguousarray(state_vector)
+            return measure_collapse(state_vector, target_qubit, rnd), state_vector
+        # Amplitudes with the target at 0 and at 1 are the two halves of this view
+        pairs = state_vector.reshape(-1, 2, 1 << target_qubit)
+        p0, p1 = self._branch_probabilities(pairs)
         # Sample outcome
-        r = np.random.random()
-        outcome = 0 if r < p0 else 1
-        # Collapse
-        new_state = np.zeros_like(state_vector)
-        norm = np.sqrt(p0 if outcome == 0 else p1) if (p0 + p1) > 0 else 1.0
+        outcome = 0 if rnd < p0 else 1
+        norm = np.sqrt(p1 if outcome else p0)
         if norm == 0:
             # Degenerate case: state has zero probability; return unchanged
-            return outcome, Statevector(state_vector)
-        for idx in range(dim):
-            if ((idx & mask) == 0 and outcome == 0) or ((idx & mask) != 0 and outcome == 1):
-                new_state[idx] = state_vector[idx] / norm
-        return outcome, Statevector(new_state)
+            return outcome, state_vector
+        # Collapse
+        pairs[:, 1 - outcome, :] = 0
+        pairs[:, outcome, :] /= norm
+        return outcome, state_vector
 
-    def _reset_qubit(self, state_vector: np.ndarray, n_qubits: int, target_qubit: int) -> np.ndarray:
-        """Reset target qubit to |0> state by zeroing |1> components and renormalizing."""
-        dim = 2 ** n_qubits
-        mask = 1 << target_qubit
-        new_state = state_vector.copy()
-        # Zero out |1> components
-        for idx in range(dim):
-            if (idx & mask) != 0:
-                new_state[idx] = 0.0 + 0.0j
-        # Renormalize
-        norm = np.linalg.norm(new_state)
-        if norm > 0:
-            new_state = new_state / norm
-        return new_state
+    def _reset_qubit(self, state_vector: np.ndarray, n_qubits: int, target_qubit: int,
+                     rnd: Optional[float] = None) -> np.ndarray:
+        """
+        Reset target qubit to |0> along one trajectory: sample its value as a
+        measurement would (with uniform rnd, drawn from np.random if None),
+        then move that branch's amplitudes onto |0>.
+        Like _measure_and_collapse, updates state_vector in place and returns it.
+        """
+        if rnd is None:
+            rnd = np.random.random()
+        if _HAS_NUMBA:
+            state_vector = np.ascontiguousarray(state_vector)
+            reset_qubit(state_vector, target_qubit, rnd)
+            return state_vector
+        pairs = state_vector.reshape(-1, 2, 1 << target_qubit)
+        p0, p1 = self._branch_probabilities(pairs)
+        outcome = 0 if rnd < p0 else 1
+        norm = np.sqrt(p1 if outcome else p0)
+        if norm == 0:
+            return state_vector
+        if outcome:
+            pairs[:, 0, :] = pairs[:, 1, :]
+        pairs[:, 0, :] /= norm
+        pairs[:, 1, :] = 0
+        return state_vector
+
+    @staticmethod
+    def _branch_probabilities(pairs: np.ndarray) -> Tuple[float, float]:
+        """(p0, p1) of the target qubit from the (rest, 2, 2^q) view of a statevector"""
+        zero = pairs[:, 0, :]
+        one = pairs[:, 1, :]
+        return float(np.vdot(zero, zero).real), float(np.vdot(one, one).real)
+
+    @staticmethod
+    def _apply_named_gate(state_vector: np.ndarray, name: str, n_qubits: int, qargs: List[int]) -> None:
+        """
+        Apply one of NAMED_GATES to state_vector in place, as swaps and scalings
+        of amplitude slices without building its matrix.
+        """
+        if len(qargs) == 1:
+            pairs = state_vector.reshape(-1, 2, 1 << qargs[0])
+            if name in PHASE_GATES:
+                pairs[:, 1, :] *= PHASE_GATES[name]
+            elif name == 'x':
+                pairs[:, 0, :], pairs[:, 1, :] = pairs[:, 1, :].copy(), pairs[:, 0, :].copy()
+            else:
+                # y = [[0, -i], [i, 0]]
+                pairs[:, 0, :], pairs[:, 1, :] = -1j * pairs[:, 1, :], 1j * pairs[:, 0, :]
+            return
+        
+        # Two-qubit gates on the rank-n tensor; qubit q is axis n-1-q
+        psi = state_vector.reshape((2,) * n_qubits)
+        first_axis = n_qubits - 1 - qargs[0]
+        second_axis = n_qubits - 1 - qargs[1]
+        
+        def block(first_bit: int, second_bit: int) -> tuple:
+            index = [slice(None)] * n_qubits
+            index[first_axis] = first_bit
+            index[second_axis] = second_bit
+            return tuple(index)
+        
+        if name == 'cx':
+            # Control is qargs[0]: swap the target's amplitudes where it is set
+            psi[block(1, 0)], psi[block(1, 1)] = psi[block(1, 1)].copy(), psi[block(1, 0)].copy()
+        elif name == 'cz':
+            psi[block(1, 1)] *= -1
+        else:
+            psi[block(0, 1)], psi[block(1, 0)] = psi[block(1, 0)].copy(), psi[block(0, 1)].copy()
+
+    @staticmethod
+    def _apply_1q(state_vector: np.ndarray, gate_matrix: np.ndarray, target_qubit: int) -> np.ndarray:
+        """
+        Apply a 2x2 gate to target_qubit. Amplitude pairs (i, i | 2^target) are
+        the two halves of a (rest, 2, 2^target) view, updated in two vector ops.
+        """
+        pairs = state_vector.reshape(-1, 2, 1 << target_qubit)
+        zero = pairs[:, 0, :]
+        one = pairs[:, 1, :]
+        new_state = np.empty_like(pairs)
+        new_state[:, 0, :] = gate_matrix[0, 0] * zero + gate_matrix[0, 1] * one
+        new_state[:, 1, :] = gate_matrix[1, 0] * zero + gate_matrix[1, 1] * one
+        return new_state.reshape(-1)
+
+    @staticmethod
+    def _apply_2q(state_vector: np.ndarray, gate_matrix: np.ndarray, n_qubits: int, qargs: List[int]) -> np.ndarray:
+        """
+        Apply a 4x4 gate to qargs (bit j of its index is qargs[j], as in Qiskit)
+        with one tensordot over the two qubit axes of the rank-n state tensor.
+        """
+        # Tensor axis of qubit q is n-1-q; the gate tensor is (out1, out0, in1, in0)
+        axes = [n_qubits - 1 - qargs[1], n_qubits - 1 - qargs[0]]
+        psi = state_vector.reshape((2,) * n_qubits)
+        out = np.tensordot(gate_matrix.reshape(2, 2, 2, 2), psi, axes=([2, 3], axes))
+        return np.moveaxis(out, [0, 1], axes).reshape(-1)
 
     def _apply_matrix_to_qubits(self, state_vector: np.ndarray, gate_matrix: np.ndarray, n_qubits: int, qargs: List[int]) -> np.ndarray:
         """
         Apply a small gate_matrix acting on qargs to the full state_vector.
         gate_matrix has dimension 2^k x 2^k where k=len(qargs).
+        Bit j of the gate's row/column index is qubit qargs[j], as in Qiskit.
         """
         k = len(qargs)
         assert gate_matrix.shape == (2**k, 2**k)
-        # Sort qargs for consistent bit order (little-endian: qubit 0 is LSB)
+        if _HAS_NUMBA:
+            return apply_matrix(np.ascontiguousarray(state_vector),
+                                np.ascontiguousarray(gate_matrix, dtype=state_vector.dtype),
+                                np.asarray(qargs, dtype=np.int64))
+        # Other qubits are enumerated in ascending order (little-endian: qubit 0 is LSB)
         qargs_sorted = sorted(qargs)
         # Map basis index regrouping
         dim = 2 ** n_qubits
@@ -345,7 +658,7 @@ class TrajectoryPipeline(SimulationPipeline):
             block = np.zeros(2**k, dtype=complex)
             for sub in range(2 ** k):
                 idx = template
-                for j, q in enumerate(qargs_sorted):
+                for j, q in enumerate(qargs):
                     if (sub >> j) & 1:
                         idx |= (1 << q)
                 block[sub] = state_vector[idx]
@@ -354,24 +667,12 @@ class TrajectoryPipeline(SimulationPipeline):
             # Scatter back
             for sub in range(2 ** k):
                 idx = template
-                for j, q in enumerate(qargs_sorted):
+                for j, q in enumerate(qargs):
                     if (sub >> j) & 1:
                         idx |= (1 << q)
                 new_state[idx] = block_out[sub]
         return new_state
     
-    def _format_density_matrix(self, rho: np.ndarray) -> list:
-        """Format density matrix as JSON-safe [[re,im], ...]."""
-        formatted = []
-        for i in range(2):
-            row = []
-            for j in range(2):
-                real = clip_tiny_values(rho[i, j].real)
-                imag = clip_tiny_values(rho[i, j].imag)
-                row.append([float(real), float(imag)])
-            formatted.append(row)
-        return formatted
-    
     def _estimate_memory(self, n_qubits: int) -> float:
         """Estimate memory usage for trajectory simulation"""
         # Memory scales with single trajectory, not total shots
@@ -387,21 +688,45 @@ class TrajectoryPipeline(SimulationPipeline):
         single_traj_time = 0.01 * (2 ** n_qubits) * n_ops / 10000
         return shots * single_traj_time * 1.5  # 50% overhead
     
-    def preprocess_circuit(self, circuit: QuantumCircuit) -> QuantumCircuit:
+    def preprocess_circuit(self, circuit: QuantumCircuit,
+                           has_measurements: Optional[bool] = None) -> QuantumCircuit:
         """
         Preprocess circuit for trajectory simulation.
+        
+        has_measurements skips the scan when the caller already knows. The
+        circuit is only copied when a classical register has to be added.
         """
-        # Ensure circuit has classical registers for measurements
-        processed = circuit.copy()
+        if has_measurements is None:
+            has_measurements = self._has_measurements(circuit)
         
         # Add classical register if measurements exist but no classical register
-        has_measurements = self._has_measurements(processed)
-        if has_measurements and not processed.cregs:
+        if has_measurements and not circuit.cregs:
             from qiskit import ClassicalRegister
+            processed = circuit.copy()
             creg = ClassicalRegister(processed.num_qubits, 'c')
             processed.add_register(creg)
+            return processed
         
-        return processed
+        return circuit
+    
+    def merge_results(self, partials: List[PipelineResult], weights: List[int]) -> PipelineResult:
+        """
+        Combine results of independent trajectory runs over disjoint shot chunks.
+        
+        The merged density matrix of each qubit is the shot-weighted mean of the
+        chunk averages; Bloch coordinates and purity are recomputed from it.
+        
+        Args:
+            partials: Results returned by run() for each chunk
+            weights: Number of shots used for each chunk
+            
+        Returns:
+            Results in the same format as run()
+        """
+        rhos = np.average([partial.rho for partial in partials], axis=0, weights=weights)
+        # Chunks run concurrently, so wall time is that of the slowest chunk
+        execution_time = max(partial.execution_time for partial in partials)
+        return self.postprocess_results(*compute_bloch_and_purity(rhos), rhos, execution_time)
     
     def get_shot_requirements(self) -> Dict[str, int]:
         """Return shot count recommendations"""
@@ -3,14 +3,71 @@ Unitary simulation pipeline using statevector simulation.
 Implementation based on dev_plane.md specifications.
 """
 
+import functools
+import os
+from collections import OrderedDict
 import numpy as np
 import time
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from qiskit.quantum_info import Statevector
-from qiskit import QuantumCircuit
+from qiskit import QuantumCircuit, transpile
+from qiskit_aer import AerSimulator
 
-from pipelines.base import SimulationPipeline, SimulationError, UnsupportedCircuitError
-from utils import compute_bloch_vector, compute_purity, clip_tiny_values
+from pipelines.base import SimulationPipeline, PipelineResult, STATE_DTYPE, NON_UNITARY_OPS, scratch_buffer, SimulationError, UnsupportedCircuitError, ProgressCallback
+from pipelines._kernels import _HAS_NUMBA
+if _HAS_NUMBA:
+    from pipelines._kernels import single_qubit_rdms
+from utils import compute_bloch_and_purity, circuit_fingerprint
+
+# Threads for the per-qubit reductions (QSV_REDUCTION_THREADS, default 1 = serial).
+# numpy releases the GIL in the matmuls, but the simulation pool already runs one
+# worker per core, so only raise this when workers have cores to spare.
+REDUCTION_THREADS = int(os.getenv("QSV_REDUCTION_THREADS", "1"))
+# Below this many qubits a reduction is too small to be worth a thread hop
+PARALLEL_REDUCTION_MIN_QUBITS = 4
+
+# From this width Aer's compiled statevector evolution beats
+# Statevector.from_instruction, transpile included once it is cached
+AER_STATEVECTOR_MIN_QUBITS = 16
+
+_REDUCTION_POOL: Optional[ThreadPoolExecutor] = None
+
+def get_reduction_pool() -> ThreadPoolExecutor:
+    """Thread pool for the per-qubit reductions, created on first use"""
+    global _REDUCTION_POOL
+    if _REDUCTION_POOL is None:
+        _REDUCTION_POOL = ThreadPoolExecutor(max_workers=REDUCTION_THREADS)
+    return _REDUCTION_POOL
+
+def all_single_qubit_rdms(state_vector: np.ndarray, n_qubits: int) -> np.ndarray:
+    """
+    Reduced density matrices of every qubit from one statevector, as complex128 (n_qubits, 2, 2).
+    
+    For each qubit the amplitudes with that qubit at 0 and at 1 are the two
+    halves of a (rest, 2, 2^q) view of the flat array (qubit 0 is the least
+    significant bit), so ρ needs no index branching or transpose: ρ00 = Σ|a|²,
+    ρ11 = Σ|b|², ρ01 = Σ a·conj(b). Normalization then runs once over the whole
+    stack. Any leading shot axis is summed along with the traced qubits.
+    """
+    rhos = np.empty((n_qubits, 2, 2), dtype=np.complex128)
+    flat = state_vector.reshape(-1)
+    if _HAS_NUMBA:
+        # One compiled pass per qubit, without copying the halves
+        single_qubit_rdms(flat, n_qubits, rhos)
+    else:
+        for qubit_id in range(n_qubits):
+            halves = flat.reshape(-1, 2, 1 << qubit_id)
+            zero = halves[:, 0, :].ravel()
+            one = halves[:, 1, :].ravel()
+            rhos[qubit_id, 0, 0] = np.vdot(zero, zero).real
+            rhos[qubit_id, 1, 1] = np.vdot(one, one).real
+            rhos[qubit_id, 0, 1] = np.vdot(one, zero)
+            rhos[qubit_id, 1, 0] = np.conj(rhos[qubit_id, 0, 1])
+    traces = rhos[:, 0, 0].real + rhos[:, 1, 1].real
+    normalizable = np.abs(traces) > 1e-15
+    rhos[normalizable] /= traces[normalizable, None, None]
+    return rhos
 
 class UnitaryPipeline(SimulationPipeline):
     """
@@ -22,15 +79,32 @@ class UnitaryPipeline(SimulationPipeline):
     - Exact quantum state simulation
     
     Implementation details from dev_plane.md:
-    - Simulate statevector: Statevector.from_instruction(circuit)
-    - Compute RDM per qubit: Vectorized NumPy loop over basis
+    - Simulate statevector: Statevector.from_instruction(circuit), or Aer's
+      statevector method (save_statevector) from AER_STATEVECTOR_MIN_QUBITS qubits
+    - Compute RDM per qubit: all_single_qubit_rdms over views of the flat statevector
     - Bloch calc: rx = 2 * Re(rho[0,1]), ry = -2 * Im(rho[0,1]), rz = rho[0,0] - rho[1,1]
-    - Purity: np.trace(np.dot(rho, rho))
+    - Purity: rho00^2 + rho11^2 + 2|rho01|^2 (closed form of Tr(rho^2) for 2x2 rho)
     """
     
-    def __init__(self):
+    max_qubits = 20  # As specified in routing logic
+    
+    # Transpiled circuits kept per instance for the Aer evolution path
+    transpile_cache_size = 64
+    
+    # Precision of the reductions: 'single' (complex64) halves the memory
+    # traffic of the partial traces, 'double' keeps complex128 throughout.
+    # The evolution itself always runs in double precision.
+    precision = 'single'
+    
+    def __init__(self, precision: Optional[str] = None):
         super().__init__("UnitaryPipeline")
-        self.max_qubits = 20  # As specified in routing logic
+        if precision is not None:
+            if precision not in ('single', 'double'):
+                raise ValueError(f"Unknown precision: {precision}")
+            self.precision = precision
+        self._state_dtype = STATE_DTYPE if self.precision == 'single' else np.complex128
+        self._simulator: Optional[AerSimulator] = None
+        self._transpile_cache: OrderedDict = OrderedDict()
     
     def validate_circuit(self, circuit: QuantumCircuit) -> bool:
         """
@@ -42,22 +116,22 @@ class UnitaryPipeline(SimulationPipeline):
         - No noise channels
         - ≤ 20 qubits for performance
         """
-        if not super().validate_circuit(circuit):
+        # Check qubit limit for unitary pipeline (tighter than the global MAX_QUBITS)
+        n_qubits = circuit.num_qubits
+        if n_qubits > self.max_qubits:
+            self.logger.warning(f"Circuit has {n_qubits} qubits > {self.max_qubits} limit")
             return False
-        
-        # Check qubit limit for unitary pipeline
-        if circuit.num_qubits > self.max_qubits:
-            self.logger.warning(f"Circuit has {circuit.num_qubits} qubits > {self.max_qubits} limit")
+        if n_qubits <= 0:
             return False
         # Check for non-unitary operations
-        non_unitary_ops = {'measure', 'reset', 'noise', 'kraus'}
         for instr in circuit.data:
-            if instr.operation.name.lower() in non_unitary_ops:
+            if instr.operation.name in NON_UNITARY_OPS:
                 self.logger.warning(f"Non-unitary operation found: {instr.operation.name}")
                 return False
         return True
     
-    def run(self, circuit: QuantumCircuit, shots: int = 1024) -> Dict[int, Dict[str, Any]]:
+    def run(self, circuit: QuantumCircuit, shots: int = 1024,
+            progress_cb: Optional[ProgressCallback] = None) -> PipelineResult:
         """
         Run unitary simulation using statevector method.
         
@@ -81,60 +155,95 @@ class UnitaryPipeline(SimulationPipeline):
             
             # Simulate statevector evolution
             try:
-                statevector = Statevector.from_instruction(processed_circuit)
-                state_array = statevector.data
+                statevector = self._evolve(processed_circuit)
+                # Partial traces are memory bound; run them on a single-precision copy
+                # unless double precision was requested
+                state_array = scratch_buffer(statevector.shape, self._state_dtype)
+                np.copyto(state_array, statevector, casting='same_kind')
             except Exception as e:
                 raise SimulationError(f"Statevector simulation failed: {str(e)}", pipeline=self.name)
+            self.report_progress(progress_cb, 50, "Statevector evolution complete")
             
             # Compute reduced density matrices for each qubit
-            results = {}
             n_qubits = processed_circuit.num_qubits
+            rhos = np.empty((n_qubits, 2, 2), dtype=self._state_dtype)
+            
+            if REDUCTION_THREADS > 1 and n_qubits >= PARALLEL_REDUCTION_MIN_QUBITS:
+                # Each task only reads the shared statevector
+                reduce_qubit = functools.partial(self._reduce_qubit, state_array, n_qubits)
+                for qubit_id, rho in enumerate(get_reduction_pool().map(reduce_qubit, range(n_qubits))):
+                    rhos[qubit_id] = rho
+            else:
+                # Every qubit from views of the same flat array, no per-qubit transpose
+                rhos[:] = all_single_qubit_rdms(state_array, n_qubits)
             
-            for qubit_id in range(n_qubits):
-                try:
-                    # Fast RDM via reshape + matmul (O(2^n))
-                    rho = self._rdm_from_statevector(state_array, n_qubits, qubit_id)
-                    
-                    # Compute Bloch coordinates
-                    bloch_coords = compute_bloch_vector(rho)
-                    
-                    # Compute purity
-                    purity = compute_purity(rho)
-                    
-                    # Store results
-                    results[qubit_id] = {
-                        'bloch': list(bloch_coords),  # Ensure it's a list
-                        'purity': float(purity),
-                        'rho': self._format_density_matrix(rho)
-                    }
-                except Exception as e:
-                    self.logger.error(f"Failed to compute state for qubit {qubit_id}: {str(e)}")
-                    # Provide fallback state (|0⟩)
-                    results[qubit_id] = {
-                        'bloch': [0.0, 0.0, 1.0],
-                        'purity': 1.0,
-                        'rho': [[1.0+0j, 0.0+0j], [0.0+0j, 0.0+0j]]
-                    }
+            # Bloch coordinates and purity for all qubits at once
+            blochs, purities = compute_bloch_and_purity(rhos)
             
             execution_time = time.time() - start_time
             self.log_simulation_end(execution_time, n_qubits)
+            self.report_progress(progress_cb, 100, "Reduced states computed")
             
-            return self.postprocess_results(results, execution_time)
+            return self.postprocess_results(blochs, purities, rhos, execution_time)
             
         except Exception as e:
             execution_time = time.time() - start_time
             self.logger.error(f"Unitary simulation failed after {execution_time:.3f}s: {str(e)}")
             raise SimulationError(f"Unitary simulation failed: {str(e)}", pipeline=self.name)
     
+    def _evolve(self, circuit: QuantumCircuit) -> np.ndarray:
+        """Final statevector of circuit as a complex128 array"""
+        if circuit.num_qubits >= AER_STATEVECTOR_MIN_QUBITS:
+            try:
+                data0 = self._aer_simulator().run(self._prepared_circuit(circuit), shots=1).result().data(0)
+                return np.asarray(data0["psi"])
+            except Exception as e:
+                self.logger.warning(f"Aer statevector unavailable, using Statevector.from_instruction: {str(e)}")
+        return Statevector.from_instruction(circuit).data
+    
+    def _aer_simulator(self) -> AerSimulator:
+        """Statevector simulator, created once"""
+        if self._simulator is None:
+            self._simulator = AerSimulator(method='statevector')
+        return self._simulator
+    
+    def _prepared_circuit(self, circuit: QuantumCircuit) -> QuantumCircuit:
+        """
+        Circuit transpiled for Aer with the final statevector save appended,
+        reused for a circuit fingerprint seen before.
+        """
+        key = circuit_fingerprint(circuit)
+        tcirc = self._transpile_cache.get(key)
+        if tcirc is None:
+            tcirc = transpile(circuit, self._aer_simulator())
+            tcirc.save_statevector(label="psi")
+            self._transpile_cache[key] = tcirc
+            if len(self._transpile_cache) > self.transpile_cache_size:
+                self._transpile_cache.popitem(last=False)
+        else:
+            self._transpile_cache.move_to_end(key)
+        return tcirc
+    
+    def _reduce_qubit(self, state_vector: np.ndarray, n_qubits: int, qubit_id: int) -> np.ndarray:
+        """Reduced density matrix of one qubit, or |0⟩⟨0| if the reduction fails"""
+        try:
+            # Fast RDM via reshape + matmul (O(2^n))
+            return self._rdm_from_statevector(state_vector, n_qubits, qubit_id)
+        except Exception as e:
+            self.logger.error(f"Failed to compute state for qubit {qubit_id}: {str(e)}")
+            # Provide fallback state (|0⟩)
+            return np.array([[1.0, 0.0], [0.0, 0.0]], dtype=STATE_DTYPE)
+    
     def _rdm_from_statevector(self, state_vector: np.ndarray, n_qubits: int, target_qubit: int) -> np.ndarray:
         """
         Fast single-qubit RDM from statevector using reshape + matmul.
         Treat qubit 0 as LSB (little-endian) for axis ordering.
+        The result keeps the dtype of state_vector.
         """
         if n_qubits == 1:
             # ρ = |ψ><ψ|
             v = state_vector.reshape(2, 1)
-            return (v @ v.conj().T).astype(np.complex128)
+            return v @ v.conj().T
         shape = (2,) * n_qubits
         # In row-major reshape, the last axis corresponds to LSB (qubit 0).
         # Map target_qubit to its axis index accordingly.
@@ -148,26 +257,10 @@ class UnitaryPipeline(SimulationPipeline):
         if abs(tr) > 1e-15:
             rho = rho / tr
         # Hermitize
-        rho = 0.5 * (rho + rho.conj().T)
-        return rho.astype(np.complex128)
+        return 0.5 * (rho + rho.conj().T)
     
     # remove heavy full density matrix path; the fast path covers all cases for unitary
     
-    def _format_density_matrix(self, rho: np.ndarray) -> list:
-        """
-        Format density matrix for JSON serialization.
-        Clips tiny values and converts to nested list format.
-        """
-        formatted = []
-        for i in range(2):
-            row = []
-            for j in range(2):
-                real = clip_tiny_values(rho[i, j].real)
-                imag = clip_tiny_values(rho[i, j].imag)
-                row.append([float(real), float(imag)])
-            formatted.append(row)
-        return formatted
-    
     def _estimate_memory(self, n_qubits: int) -> float:
         """Estimate memory usage for statevector simulation"""
         # Statevector: 2^n complex numbers * 16 bytes/complex
@@ -5,13 +5,24 @@ Implements the core logic specified in dev_plane.md.
 
 import numpy as np
 from qiskit import QuantumCircuit
+from qiskit.circuit import Clbit
 from qiskit.circuit.library import *
 from qiskit import qasm2
 import re
+import hashlib
+from collections import OrderedDict
+from qiskit.converters import circuit_to_dag
+from qiskit.dagcircuit import DAGOpNode
 from typing import Dict, List, Tuple, Any, Optional
 import time
 import logging
 
+try:
+    from blake3 import blake3  # type: ignore
+    _HAS_BLAKE3 = True
+except Exception:
+    _HAS_BLAKE3 = False
+
 logger = logging.getLogger(__name__)
 
 # Supported gate whitelist for security
@@ -31,7 +42,27 @@ SUPPORTED_GATES = {
 }
 
 # Non-unitary operations that affect routing (barrier is unitary/no-op)
-NON_UNITARY_OPS = {'measure', 'reset'}
+NON_UNITARY_OPS = frozenset(('measure', 'reset'))
+
+# Parsed circuits keyed by QASM digest; repeated submissions skip the QASM parser
+PARSE_CACHE_SIZE = 256
+_PARSE_CACHE: "OrderedDict[bytes, Tuple[Optional[QuantumCircuit], Dict[str, Any]]]" = OrderedDict()
+
+# Semantic circuit fingerprints keyed by QASM digest
+_FINGERPRINT_CACHE: "OrderedDict[bytes, bytes]" = OrderedDict()
+
+# Longest QASM source accepted (matches SimulationRequest.qasm_code max_length)
+MAX_QASM_CHARS = 100_000
+
+# Magnitudes below this are shown as exact zeros (frontend_plan.md display rule)
+TINY_VALUE_THRESHOLD = 1e-12
+
+# Pre-parse guard patterns, compiled once at import
+_COMMENT_RE = re.compile(r"//[^\n]*")
+_QREG_RE = re.compile(r"qreg\s+\w+\s*\[\s*(\d+)\s*\]")
+_DECLARATION_RE = re.compile(r"(?:^|[;}])\s*(?:OPENQASM|include|qreg|creg)\b", re.MULTILINE)
+# gate bodies and opaque declarations define gates rather than apply them
+_GATE_DEFINITION_RE = re.compile(r"\bgate\b[^{]*\{[^}]*\}|\bopaque\b[^;]*;")
 
 def parse_and_validate_circuit(qasm_code: str) -> Tuple[QuantumCircuit, Dict[str, Any]]:
     """
@@ -207,6 +238,127 @@ def parse_and_validate_circuit(qasm_code: str) -> Tuple[QuantumCircuit, Dict[str
         logger.error(f"Circuit validation failed: {str(e)}")
         return None, validation_info
 
+def qasm_digest(qasm_code: str) -> bytes:
+    """Return a compact 16-byte digest of QASM source, used as a cache key."""
+    if _HAS_BLAKE3:
+        return blake3(qasm_code.encode()).digest(length=16)
+    return hashlib.blake2b(qasm_code.encode(), digest_size=16).digest()
+
+def parse_and_validate_circuit_cached(qasm_code: str) -> Tuple[QuantumCircuit, Dict[str, Any]]:
+    """
+    LRU-cached variant of parse_and_validate_circuit keyed by the QASM digest.
+    
+    The cached circuit is shared between callers, so it must be treated as
+    read-only; pipelines copy the circuit before adding registers or save
+    instructions.
+    
+    Args:
+        qasm_code: OpenQASM 2.0 code string
+        
+    Returns:
+        Tuple of (parsed_circuit, validation_info)
+    """
+    key = qasm_digest(qasm_code)
+    cached = _PARSE_CACHE.get(key)
+    if cached is not None:
+        _PARSE_CACHE.move_to_end(key)
+    else:
+        cached = parse_and_validate_circuit(qasm_code)
+        _PARSE_CACHE[key] = cached
+        if len(_PARSE_CACHE) > PARSE_CACHE_SIZE:
+            _PARSE_CACHE.popitem(last=False)
+    
+    return cached
+
+def circuit_fingerprint(circuit: QuantumCircuit) -> bytes:
+    """
+    Digest of a circuit's semantics rather than its QASM text.
+    
+    The circuit is converted to its DAG and walked in a deterministic
+    topological order (ties broken lexicographically), so formatting,
+    comments, register names and the relative order of gates on disjoint
+    qubits do not change the result. Parameters are rounded to 12 digits.
+    
+    Args:
+        circuit: Parsed quantum circuit
+        
+    Returns:
+        16-byte digest identifying the circuit up to those rewrites
+    """
+    dag = circuit_to_dag(circuit)
+    
+    def node_token(node) -> str:
+        if not isinstance(node, DAGOpNode):
+            # Input/output wire nodes; only reached when ordering the walk
+            return ""
+        qubits = ",".join(str(dag.find_bit(q).index) for q in node.qargs)
+        clbits = ",".join(str(dag.find_bit(c).index) for c in node.cargs)
+        params = ",".join(
+            repr(round(float(p), 12)) if isinstance(p, (int, float, np.floating)) else str(p)
+            for p in node.op.params
+        )
+        token = f"{node.op.name}({params})[{qubits}][{clbits}]"
+        condition = getattr(node.op, "condition", None)
+        if condition is not None:
+            target, value = condition
+            bits = [target] if isinstance(target, Clbit) else list(target)
+            token += f"?{','.join(str(dag.find_bit(b).index) for b in bits)}=={value}"
+        return token
+    
+    tokens = [f"{circuit.num_qubits}q{circuit.num_clbits}c"]
+    tokens.extend(node_token(node) for node in dag.topological_op_nodes(key=node_token))
+    return hashlib.blake2b(";".join(tokens).encode(), digest_size=16).digest()
+
+def circuit_fingerprint_cached(qasm_code: str, circuit: QuantumCircuit) -> bytes:
+    """circuit_fingerprint memoized by QASM digest, so repeat submissions skip the DAG walk"""
+    key = qasm_digest(qasm_code)
+    fingerprint = _FINGERPRINT_CACHE.get(key)
+    if fingerprint is not None:
+        _FINGERPRINT_CACHE.move_to_end(key)
+        return fingerprint
+    fingerprint = circuit_fingerprint(circuit)
+    _FINGERPRINT_CACHE[key] = fingerprint
+    if len(_FINGERPRINT_CACHE) > PARSE_CACHE_SIZE:
+        _FINGERPRINT_CACHE.popitem(last=False)
+    return fingerprint
+
+def prescan_qasm_limits(qasm_code: str, max_qubits: int = 24, max_operations: int = 1000,
+                        max_chars: int = MAX_QASM_CHARS) -> Optional[str]:
+    """
+    Cheap pre-parse check of QASM source against the simulation limits.
+    
+    Rejects oversized sources outright, then sums the declared qreg widths and
+    counts the statements outside declarations and gate/opaque definitions.
+    Each of those becomes at least one instruction (broadcasts such as
+    measure q -> c; expand to more), so the count is a lower bound on the
+    parsed operation count and only certain violations are rejected here;
+    the post-parse check enforces the exact limit.
+    
+    Args:
+        qasm_code: OpenQASM 2.0 code string
+        max_qubits: Maximum total qubit count
+        max_operations: Maximum number of operations
+        max_chars: Maximum length of the QASM source
+        
+    Returns:
+        Error message if a limit is certainly exceeded, otherwise None
+    """
+    if len(qasm_code) > max_chars:
+        return f"QASM source exceeds {max_chars} characters"
+    
+    code = _COMMENT_RE.sub("", qasm_code)
+    
+    num_qubits = sum(int(size) for size in _QREG_RE.findall(code))
+    if num_qubits > max_qubits:
+        return f"Maximum {max_qubits} qubits supported"
+    
+    code = _GATE_DEFINITION_RE.sub("", code)
+    num_declarations = len(_DECLARATION_RE.findall(code))
+    if code.count(";") - num_declarations > max_operations:
+        return f"Maximum {max_operations} operations supported"
+    
+    return None
+
 def route_circuit(circuit: QuantumCircuit, shots: int = 1024, force_pipeline: Optional[str] = None) -> str:
     """
     Route quantum circuit to appropriate simulation pipeline.
@@ -233,17 +385,16 @@ def route_circuit(circuit: QuantumCircuit, shots: int = 1024, force_pipeline: Op
         else:
             logger.warning(f"Invalid force_pipeline {force_pipeline}, using automatic routing")
     
-    # Check if circuit is unitary (no measurements/resets)
-    is_unitary = all(
-        instr.operation.name.lower() not in NON_UNITARY_OPS 
-        for instr in circuit.data
-    )
+    # Check if circuit is unitary (no measurements/resets); stops at the first one.
+    # Qiskit operation names are already lowercase.
+    is_unitary = not any(instr.operation.name in NON_UNITARY_OPS for instr in circuit.data)
     
-    # Debug: Log the operations found
-    ops_found = [instr.operation.name.lower() for instr in circuit.data]
-    non_unitary_found = [op for op in ops_found if op in NON_UNITARY_OPS]
-    logger.info(f"Circuit operations: {ops_found}")
-    logger.info(f"Non-unitary operations found: {non_unitary_found}")
+    # Debug: Log the operations found (only built when INFO is enabled)
+    if logger.isEnabledFor(logging.INFO):
+        ops_found = [instr.operation.name for instr in circuit.data]
+        non_unitary_found = [op for op in ops_found if op in NON_UNITARY_OPS]
+        logger.info(f"Circuit operations: {ops_found}")
+        logger.info(f"Non-unitary operations found: {non_unitary_found}")
     
     qubit_count = circuit.num_qubits
     op_count = len(circuit.data)
@@ -323,40 +474,42 @@ def compute_purity(rho: np.ndarray) -> float:
     
     return float(purity)
 
-def partial_trace_qubit(state_vector: np.ndarray, total_qubits: int, target_qubit: int) -> np.ndarray:
+def compute_bloch_and_purity(rhos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Compute partial trace for a single qubit from full state vector.
+    Bloch coordinates and purities of a stack of single-qubit density matrices.
+    
+    Batched, fused form of compute_bloch_vector and compute_purity using the
+    2x2 closed forms; for Hermitian rho, Tr(rho^2) = rho00^2 + rho11^2 + 2|rho01|^2.
     
     Args:
-        state_vector: Full quantum state vector
-        total_qubits: Total number of qubits in system
-        target_qubit: Index of qubit to compute reduced density matrix for
+        rhos: (n, 2, 2) density matrices
         
     Returns:
-        2x2 reduced density matrix for target qubit
+        Tuple of (n, 3) float64 Bloch coordinates and (n,) float64 purities in [0, 1]
     """
-    # Initialize the reduced density matrix
-    rho = np.zeros((2, 2), dtype=complex)
+    rho00 = rhos[:, 0, 0].real.astype(np.float64)
+    rho11 = rhos[:, 1, 1].real.astype(np.float64)
+    rho01 = rhos[:, 0, 1].astype(np.complex128)
     
-    # Sum over all computational basis states
-    total_states = 2 ** total_qubits
-    
-    for i in range(total_states):
-        for j in range(total_states):
-            # Extract the target qubit state for both i and j
-            target_i = (i >> target_qubit) & 1
-            target_j = (j >> target_qubit) & 1
-            
-            # Check if all other qubits are the same between i and j
-            # (this is the condition for the partial trace)
-            mask = ~(1 << target_qubit) & ((1 << total_qubits) - 1)
-            if (i & mask) == (j & mask):
-                # Add the contribution to the reduced density matrix
-                rho[target_i, target_j] += state_vector[i].conj() * state_vector[j]
+    bloch = np.stack((2.0 * rho01.real, -2.0 * rho01.imag, rho00 - rho11), axis=1)
+    # Clip tiny numerical errors
+    bloch[np.abs(bloch) < TINY_VALUE_THRESHOLD] = 0.0
     
-    return rho
+    purity = rho00 * rho00 + rho11 * rho11 + 2.0 * (rho01.real * rho01.real + rho01.imag * rho01.imag)
+    np.clip(purity, 0.0, 1.0, out=purity)
+    return bloch, purity
+
+def format_density_matrices(rhos: np.ndarray, threshold: float = TINY_VALUE_THRESHOLD) -> np.ndarray:
+    """
+    Format (n, 2, 2) complex density matrices for JSON as an (n, 2, 2, 2) float
+    array of [re, im] pairs, with tiny values clipped to zero as in clip_tiny_values.
+    """
+    formatted = np.stack((rhos.real, rhos.imag), axis=-1)
+    # One masked store instead of a clip_tiny_values call per entry
+    formatted[np.abs(formatted) < threshold] = 0.0
+    return formatted
 
-def clip_tiny_values(value: float, threshold: float = 1e-12) -> float:
+def clip_tiny_values(value: float, threshold: float = TINY_VALUE_THRESHOLD) -> float:
     """
     Clip tiny values to zero to avoid numerical precision issues.
     
@@ -0,0 +1,140 @@
+"""
+Process-pool entry points for simulation jobs.
+
+Functions in this module run inside the simulation pool worker processes created by
+main.py. They only receive picklable inputs (pipeline name, QASM source, shots)
+and rebuild the circuit locally, so no QuantumCircuit crosses the process boundary.
+
+Results come back as a pickled PipelineResult. Its arrays hold at most 24 qubits'
+worth of (3,), scalar and 2x2 entries (under 2 KB), which pickles faster than
+creating and unlinking a SharedMemory segment would take.
+"""
+
+from typing import Dict, Any, Optional, Callable
+import logging
+import os
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import numpy as np
+
+from qiskit import QuantumCircuit
+
+from utils import parse_and_validate_circuit_cached
+from pipelines import PipelineResult, SimulationError, AVAILABLE_PIPELINES, get_pipeline_class
+
+# Bound run methods of the pipeline instances owned by this worker process,
+# created on first use (the forkserver preloads the pipeline modules)
+_RUNS: Dict[str, Callable[..., PipelineResult]] = {}
+
+def init_worker():
+    """Pool initializer: per-process logging and memory limit"""
+    configure_worker_logging()
+    limit_worker_memory()
+
+def limit_worker_memory():
+    """
+    Cap the worker's address space (QSV_WORKER_MEMORY_MB, default 4096; 0 disables).
+    
+    A runaway parse or simulation then fails with MemoryError inside the
+    job instead of exhausting the host.
+    """
+    limit_mb = int(os.getenv("QSV_WORKER_MEMORY_MB", "4096"))
+    if limit_mb <= 0 or resource is None:
+        return
+    limit = limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def configure_worker_logging():
+    """
+    Pool initializer: log straight to stderr from worker processes.
+    
+    Forked workers inherit the server's QueueHandler, but not the listener
+    thread that drains its queue, so their records would otherwise be lost.
+    """
+    logging.basicConfig(level=logging.INFO, force=True)
+
+# Sentinel put on a progress queue once the pipeline has finished
+PROGRESS_DONE = "done"
+
+# Pipelines already exercised in this worker process
+_WARMED = set()
+# Enough shots to stay above the trajectory pipeline's low-statistics warning
+_WARMUP_SHOTS = 100
+
+def warm_pipeline(pipeline_name: str) -> bool:
+    """
+    Run a one-qubit circuit through a pipeline so its lazy imports and
+    simulator backend are initialised before the real job arrives.
+    
+    Returns True if the pipeline was warmed by this call.
+    """
+    if pipeline_name in _WARMED:
+        return False
+    try:
+        circuit = QuantumCircuit(1)
+        circuit.h(0)
+        select_run(pipeline_name)(circuit, _WARMUP_SHOTS)
+    except Exception:
+        # Warmup is best effort; the real run reports any genuine failure
+        return False
+    _WARMED.add(pipeline_name)
+    return True
+
+def warm_all_pipelines() -> int:
+    """Warm every pipeline in this worker process; returns how many were newly warmed"""
+    return sum(warm_pipeline(name) for name in AVAILABLE_PIPELINES)
+
+def select_run(pipeline_name: str) -> Callable[..., PipelineResult]:
+    """Return the run method for a pipeline name, instantiating the pipeline once per process."""
+    run = _RUNS.get(pipeline_name)
+    if run is None:
+        if pipeline_name not in AVAILABLE_PIPELINES:
+            raise SimulationError(f"Unknown pipeline: {pipeline_name}", pipeline=pipeline_name)
+        run = _RUNS[pipeline_name] = get_pipeline_class(pipeline_name)().run
+    return run
+
+def run_pipeline(pipeline_name: str, qasm_code: str, shots: int,
+                 progress_queue: Optional[Any] = None) -> PipelineResult:
+    """
+    Parse QASM and run it through the named pipeline.
+
+    Args:
+        pipeline_name: Registered pipeline name ('unitary', 'exact_density', 'trajectory')
+        qasm_code: OpenQASM 2.0 source of the circuit
+        shots: Number of shots for the simulation
+        progress_queue: Optional multiprocessing Manager queue receiving
+            (percent, message) progress tuples from the pipeline, followed by
+            PROGRESS_DONE when the run ends
+
+    Returns:
+        PipelineResult of the run
+    """
+    circuit, validation_info = parse_and_validate_circuit_cached(qasm_code)
+    if circuit is None:
+        raise SimulationError(f"Invalid circuit: {validation_info['errors']}", pipeline=pipeline_name)
+    if progress_queue is None:
+        return select_run(pipeline_name)(circuit, shots)
+    
+    progress_cb = lambda progress, message: progress_queue.put_nowait((progress, message))
+    try:
+        return select_run(pipeline_name)(circuit, shots, progress_cb=progress_cb)
+    finally:
+        # Lets the reader stop as soon as the last update has been forwarded
+        progress_queue.put_nowait(PROGRESS_DONE)
+
+def run_trajectory_chunk(qasm_code: str, shots: int, seed: int) -> PipelineResult:
+    """
+    Run one chunk of a trajectory simulation with its own RNG seed.
+
+    Forked workers inherit the parent's global RNG state, so each chunk must be
+    seeded explicitly or the chunks would replay identical trajectories.
+    """
+    np.random.seed(seed)
+    return run_pipeline("trajectory", qasm_code, shots)